@@ -0,0 +1,344 @@
+"""
+Cliente da API Translek.
+- Busca concorrente de os-details com limite de requisições simultâneas.
+- Token bucket no lugar do sleep fixo entre chamadas.
+- Retentativa com backoff exponencial em 429/5xx.
+- Sessão HTTP única (keep-alive, gzip) e token de autenticação reutilizado até perto de expirar.
+- GET condicional (ETag/If-None-Match, Last-Modified/If-Modified-Since) quando a API informa validadores.
+- Histograma de latência por endpoint.
+"""
+import base64
+import json
+import random
+import threading
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+API_BASE_URL = "https://yjlcmonbid.execute-api.us-east-1.amazonaws.com"
+
+# Padrões da busca de detalhes (podem ser sobrescritos no config.json)
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_LIMIT = 20.0  # requisições por segundo
+DEFAULT_MAX_RETRIES = 3
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Conexões mantidas abertas pela sessão compartilhada (>= trabalhadores simultâneos da busca de detalhes)
+SESSION_POOL_SIZE = 32
+# Validade assumida quando o token não informa a expiração; renovação antecipada antes de expirar
+DEFAULT_TOKEN_TTL = 30 * 60
+TOKEN_REFRESH_MARGIN = 60
+# Limites (ms) das faixas do histograma de latência; a última faixa é "acima do maior limite"
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """Histograma de latência de um endpoint (contagens por faixa, total e máximo)."""
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.soma_ms = 0.0
+        self.max_ms = 0.0
+        self.por_status: Dict[int, int] = {}
+
+    def observe(self, segundos: float, status: Optional[int] = None):
+        ms = segundos * 1000
+        faixa = next((i for i, limite in enumerate(self.buckets_ms) if ms <= limite), len(self.buckets_ms))
+        self.counts[faixa] += 1
+        self.total += 1
+        self.soma_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if status is not None:
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+
+    def quantil_ms(self, q: float) -> float:
+        """Quantil aproximado (limite superior da faixa que contém o quantil, sem passar do máximo observado)."""
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.counts):
+            acumulado += n
+            if acumulado >= alvo:
+                return round(min(float(self.buckets_ms[i]), self.max_ms) if i < len(self.buckets_ms) else self.max_ms, 1)
+        return self.max_ms
+
+
+_latencias: Dict[str, LatencyHistogram] = {}
+_latencias_lock = threading.Lock()
+
+
+def _endpoint(url: str) -> str:
+    """Nome do endpoint para as métricas: caminho da URL com segmentos variáveis (números/datas) trocados por {}."""
+    segmentos = urlsplit(url).path.split("/")
+    return "/".join("{}" if re.fullmatch(r"[\d\-:.]+", segmento) else segmento for segmento in segmentos)
+
+
+def _registrar_latencia(url: str, segundos: float, status: Optional[int]):
+    endpoint = _endpoint(url)
+    with _latencias_lock:
+        histograma = _latencias.get(endpoint)
+        if histograma is None:
+            histograma = _latencias[endpoint] = LatencyHistogram()
+        histograma.observe(segundos, status)
+
+
+def latency_stats() -> List[Dict[str, Any]]:
+    """Resumo das latências por endpoint desde o início do processo (para exibição)."""
+    with _latencias_lock:
+        linhas = []
+        for endpoint, h in sorted(_latencias.items()):
+            linha = {
+                "endpoint": endpoint,
+                "chamadas": h.total,
+                "média (ms)": round(h.soma_ms / h.total, 1) if h.total else 0.0,
+                "p50 (ms)": h.quantil_ms(0.5),
+                "p95 (ms)": h.quantil_ms(0.95),
+                "máx (ms)": round(h.max_ms, 1),
+                "status": ", ".join(f"{k}: {v}" for k, v in sorted(h.por_status.items())),
+            }
+            limites = [f"≤{b}" for b in h.buckets_ms] + [f">{h.buckets_ms[-1]}"]
+            linha.update(dict(zip(limites, h.counts)))
+            linhas.append(linha)
+        return linhas
+
+
+# Validadores de GET condicional por URL: (ETag, Last-Modified, payload da última resposta 200)
+_validadores: Dict[str, Tuple[Optional[str], Optional[str], Any]] = {}
+_validadores_lock = threading.Lock()
+
+
+def _headers_condicionais(url: str) -> Dict[str, str]:
+    with _validadores_lock:
+        etag, last_modified, _ = _validadores.get(url, (None, None, None))
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def guardar_validadores(url: str, response: requests.Response, payload: Any = None):
+    """Guarda ETag/Last-Modified de uma resposta 200 (e o payload, para responder um 304 depois)."""
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    with _validadores_lock:
+        if etag or last_modified:
+            _validadores[url] = (etag, last_modified, payload)
+        else:
+            _validadores.pop(url, None)
+
+
+def payload_em_cache(url: str) -> Any:
+    """Payload guardado com os validadores da URL (usado quando a API responde 304)."""
+    with _validadores_lock:
+        return _validadores.get(url, (None, None, None))[2]
+
+
+def get_session() -> requests.Session:
+    """Sessão HTTP compartilhada pelo processo (pool de conexões com keep-alive)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SESSION_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # Respostas comprimidas; o requests descomprime (inclusive em stream via iter_content)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            _session = session
+        return _session
+
+
+def _token_expira_em(token: str) -> Optional[float]:
+    """Expiração (epoch) lida do campo `exp` do token, se ele for um JWT; None caso contrário."""
+    partes = token.split(" ")[-1].split(".")
+    if len(partes) != 3:
+        return None
+    try:
+        payload = partes[1] + "=" * (-len(partes[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenManager:
+    """
+    Token de autenticação compartilhado: obtido uma vez e reutilizado por todas as chamadas
+    até TOKEN_REFRESH_MARGIN segundos antes de expirar (expiração do JWT ou DEFAULT_TOKEN_TTL).
+    """
+
+    def __init__(self, login: str, password: str, base_url: str = API_BASE_URL,
+                 session: Optional[requests.Session] = None):
+        self.login = login
+        self._password = password
+        self._url = f"{base_url}/auth/V1"
+        self._session = session
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expira_em = 0.0
+
+    def token(self, force: bool = False) -> str:
+        """Token válido (renovado se ausente, perto de expirar ou `force`). Levanta RequestException/ValueError."""
+        with self._lock:
+            if force or self._token is None or time.time() >= self._expira_em - TOKEN_REFRESH_MARGIN:
+                session = self._session or get_session()
+                inicio = time.perf_counter()
+                try:
+                    response = session.post(self._url, json={"login": self.login, "password": self._password}, timeout=10)
+                except requests.exceptions.RequestException:
+                    _registrar_latencia(self._url, time.perf_counter() - inicio, None)
+                    raise
+                _registrar_latencia(self._url, time.perf_counter() - inicio, response.status_code)
+                response.raise_for_status()
+                token = response.json().get("token")
+                if not token:
+                    raise ValueError("Token não encontrado na resposta.")
+                self._token = token
+                self._expira_em = _token_expira_em(token) or (time.time() + DEFAULT_TOKEN_TTL)
+            return self._token
+
+    def invalidate(self, token: Optional[str] = None):
+        """Descarta o token atual (ou só se ainda for `token`, quando outra thread já renovou)."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": self.token()}
+
+
+class TokenBucket:
+    """Limitador de taxa thread-safe: `rate` fichas por segundo, rajada de até `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver uma ficha disponível."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_delay(attempt: int, response: Optional[requests.Response], backoff: float) -> float:
+    """Tempo de espera antes da próxima tentativa (respeita Retry-After quando presente)."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt) + random.uniform(0, backoff)
+
+
+def get_with_retry(url: str, auth: TokenManager, timeout: float,
+                   bucket: Optional[TokenBucket] = None,
+                   max_retries: int = DEFAULT_MAX_RETRIES,
+                   backoff: float = 0.5, stream: bool = False,
+                   conditional: bool = False) -> Optional[requests.Response]:
+    """
+    GET na sessão compartilhada, com limite de taxa e retentativa em 429/5xx e erros de conexão.
+    Em 401 o token é renovado e a chamada repetida uma vez.
+    Com `conditional`, envia os validadores guardados da URL; a resposta pode ser 304 (não modificado).
+    Retorna a última resposta obtida (ou None se todas as tentativas falharam por erro de rede).
+    """
+    session = get_session()
+    response = None
+    renovou_token = False
+    attempt = 0
+    while attempt <= max_retries:
+        if bucket is not None:
+            bucket.acquire()
+        inicio = None
+        try:
+            token = auth.token()
+            headers = {"Authorization": token, **(_headers_condicionais(url) if conditional else {})}
+            inicio = time.perf_counter()
+            response = session.get(url, headers=headers, timeout=timeout, stream=stream)
+        except requests.exceptions.RequestException:
+            if inicio is not None:
+                _registrar_latencia(url, time.perf_counter() - inicio, None)
+            response = None
+            if attempt == max_retries:
+                return None
+            time.sleep(_retry_delay(attempt, None, backoff))
+            attempt += 1
+            continue
+        _registrar_latencia(url, time.perf_counter() - inicio, response.status_code)
+        if response.status_code == 401 and not renovou_token:
+            # Token expirado/revogado antes do previsto: renova uma vez (não conta como tentativa)
+            renovou_token = True
+            response.close()
+            auth.invalidate(token)
+            continue
+        if response.status_code not in RETRY_STATUS or attempt == max_retries:
+            return response
+        response.close()
+        time.sleep(_retry_delay(attempt, response, backoff))
+        attempt += 1
+    return response
+
+
+def fetch_os_details(numeros: List[int], auth: TokenManager,
+                     log_callback: Callable[[str], Any],
+                     max_workers: int = DEFAULT_MAX_WORKERS,
+                     rate_limit: float = DEFAULT_RATE_LIMIT,
+                     max_retries: int = DEFAULT_MAX_RETRIES,
+                     base_url: str = API_BASE_URL) -> Dict[Any, Dict[str, Any]]:
+    """
+    Busca /os/V1/find/os-details/{numeroos} para cada OS com até `max_workers` chamadas simultâneas.
+    O progresso é reportado pelo `log_callback` na thread chamadora (seguro para o Streamlit).
+    Retorna {numeroos: resposta} na ordem de `numeros`, apenas para as OS que responderam 200
+    (ou 304, com a resposta guardada da consulta anterior);
+    respostas com `status` falso são mantidas para indicar que a OS foi consultada.
+    """
+    total = len(numeros)
+    bucket = TokenBucket(rate_limit)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+
+    def _fetch(numeroos):
+        url = f"{base_url}/os/V1/find/os-details/{numeroos}"
+        response = get_with_retry(url, auth, timeout=15, bucket=bucket, max_retries=max_retries, conditional=True)
+        if response is None:
+            return None
+        if response.status_code == 304:
+            return payload_em_cache(url)
+        if response.status_code == 200:
+            payload = response.json()
+            guardar_validadores(url, response, payload)
+            return payload
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as executor:
+        futures = {executor.submit(_fetch, numeroos): i for i, numeroos in enumerate(numeros)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if done % 20 == 0 or done == total:
+                log_callback(f"Carregando detalhes... {done} de {total} OS")
+
+    return {numeroos: payload for numeroos, payload in zip(numeros, results) if payload is not None}
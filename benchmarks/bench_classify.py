@@ -0,0 +1,61 @@
+"""
+Micro-benchmark da classificação da situação da OS: versão linha a linha (df.apply)
+contra a vetorizada (numpy.select), em 10k/100k/1M linhas sintéticas.
+Uso: python benchmarks/bench_classify.py [--tamanhos 10000 100000 1000000] [--sem-linha]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "tests"))
+
+from data_processing import classify_os_status  # noqa: E402
+from test_data_processing import classify_os_status_linha  # noqa: E402
+
+
+def gerar_os(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    datas = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+    return pd.DataFrame({
+        "datahorainicio": pd.Series(datas).where(rng.random(n) > 0.2),
+        "datahorafim": pd.Series(datas + pd.Timedelta(days=1)).where(rng.random(n) > 0.4),
+        "status": rng.choice(["FINALIZADA", "ABERTA", "", "CANCELADA"], n),
+        "valortotal": np.where(rng.random(n) > 0.5, rng.uniform(0, 5000, n), 0.0),
+    })
+
+
+def cronometrar(func, repeticoes: int) -> float:
+    """Menor tempo (s) entre as repetições."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--sem-linha", action="store_true", help="não mede a versão linha a linha (lenta em 1M)")
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'linha a linha (s)':>18} {'vetorizada (s)':>15} {'speedup':>9}")
+    for n in args.tamanhos:
+        df = gerar_os(n)
+        t_vet = cronometrar(lambda: classify_os_status(df), repeticoes=5)
+        if args.sem_linha:
+            print(f"{n:>10} {'-':>18} {t_vet:>15.4f} {'-':>9}")
+            continue
+        t_linha = cronometrar(lambda: df.apply(classify_os_status_linha, axis=1), repeticoes=1)
+        print(f"{n:>10} {t_linha:>18.3f} {t_vet:>15.4f} {t_linha / t_vet:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark de gravação no MySQL/MariaDB local: linhas/segundo de OS e detalhes
+gravados um a um (como antes) contra os INSERT multi-linha em lote.
+Lê a conexão das variáveis de ambiente do database.py (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME);
+DB_HOST é obrigatório para não gravar no banco padrão da nuvem. Use um banco de testes:
+as OS sintéticas (numeroos a partir de --primeiro-numero) são removidas ao final.
+Uso: DB_HOST=127.0.0.1 DB_PORT=3306 DB_USER=root DB_NAME=bench \
+     python benchmarks/bench_db_writes.py [--os 5000] [--itens-por-os 4] [--sem-ssl]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def gerar_os(n: int, primeiro: int):
+    return [
+        {
+            "numeroos": primeiro + i,
+            "datahoraos": "2024-03-01T08:00:00", "datahorainicio": "2024-03-01T09:00:00",
+            "datahorafim": "2024-03-02T17:00:00", "lastupdate": "2024-03-02T17:05:00",
+            "placaequipamento": f"ABC{i % 500:04d}", "marcaequipamento": "VOLVO", "modeloequipamento": "FH 540",
+            "hodometro": str(100_000 + i), "titulomanutencao": "PREVENTIVA", "tipomanutencao": "MECÂNICA",
+            "status": "FINALIZADA", "motoristaresponsavel": f"MOTORISTA {i % 300}",
+            "mecanicoresponsavel": "MECÂNICO", "descricaoos": "TROCA DE ÓLEO E FILTROS", "fornecedor": "OFICINA",
+        }
+        for i in range(n)
+    ]
+
+
+def gerar_detalhes(itens, por_os: int):
+    return {
+        item["numeroos"]: [
+            {"material": f"PEÇA {j}", "quantidade": "2", "valorunit": "75.50",
+             "valortotal": "151.00", "quantidadeestoque": "10"}
+            for j in range(por_os)
+        ]
+        for item in itens
+    }
+
+
+def limpar(numeros):
+    with database.get_connection() as conn:
+        cur = conn.cursor()
+        for bloco in database._chunks(numeros, database.DEFAULT_BATCH_SIZE):
+            marcadores = ", ".join(["%s"] * len(bloco))
+            cur.execute(f"DELETE FROM detalhesOS WHERE numeroos IN ({marcadores})", bloco)
+            cur.execute(f"DELETE FROM ultimaatualizacao WHERE numeroos IN ({marcadores})", bloco)
+
+
+def medir(descricao: str, linhas: int, func):
+    inicio = time.perf_counter()
+    func()
+    segundos = time.perf_counter() - inicio
+    print(f"{descricao:<34} {linhas:>8} linhas {segundos:8.2f} s {linhas / segundos:10.0f} linhas/s")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--os", type=int, default=5000)
+    parser.add_argument("--itens-por-os", type=int, default=4)
+    parser.add_argument("--primeiro-numero", type=int, default=900_000_000)
+    parser.add_argument("--sem-ssl", action="store_true", help="conecta sem SSL (servidor local)")
+    args = parser.parse_args()
+
+    if not os.environ.get("DB_HOST"):
+        parser.error("defina DB_HOST (e DB_NAME) apontando para um MySQL/MariaDB de testes")
+    if args.sem_ssl:
+        # database.py exige SSL (Aiven); um servidor local normalmente não tem certificado
+        config_original = database._get_database_config
+        database._get_database_config = lambda: {
+            **config_original(), "ssl_disabled": True, "ssl_verify_cert": False, "ssl_verify_identity": False,
+        }
+
+    database.init_db()
+    itens = gerar_os(args.os, args.primeiro_numero)
+    detalhes = gerar_detalhes(itens, args.itens_por_os)
+    numeros = [item["numeroos"] for item in itens]
+    n_detalhes = args.os * args.itens_por_os
+
+    try:
+        limpar(numeros)
+        t_os_antes = medir("OS, uma por INSERT", args.os, lambda: database.inserir_os_lote(itens, batch_size=1))
+        t_det_antes = medir("detalhes, uma transação por OS", n_detalhes,
+                            lambda: [database.inserir_detalhes_os(n, d) for n, d in detalhes.items()])
+        limpar(numeros)
+        t_os_depois = medir(f"OS, lotes de {database.DEFAULT_BATCH_SIZE}", args.os,
+                            lambda: database.inserir_os_lote(itens))
+        t_det_depois = medir(f"detalhes, lotes de {database.DEFAULT_BATCH_SIZE}", n_detalhes,
+                             lambda: database.inserir_detalhes_lote(detalhes))
+    finally:
+        limpar(numeros)
+
+    print(f"speedup OS: {t_os_antes / t_os_depois:.1f}x, detalhes: {t_det_antes / t_det_depois:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
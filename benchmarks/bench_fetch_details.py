@@ -0,0 +1,110 @@
+"""
+Benchmark da busca de os-details contra um servidor HTTP local (stub) com latência simulada:
+laço serial original (requests.get + sleep de 50 ms por OS) contra api_client.fetch_os_details
+(sessão compartilhada, chamadas simultâneas e token bucket).
+Uso: python benchmarks/bench_fetch_details.py [--os 200] [--latencia-ms 80] [--workers 8] [--rate-limit 20]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_client  # noqa: E402
+
+PREFIXO_DETALHES = "/os/V1/find/os-details/"
+
+
+def criar_handler(latencia: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como a API real
+
+        def _responder(self, corpo: dict):
+            dados = json.dumps(corpo).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._responder({"token": "token-stub"})
+
+        def do_GET(self):
+            if not self.path.startswith(PREFIXO_DETALHES):
+                self.send_error(404)
+                return
+            time.sleep(latencia)
+            numeroos = int(self.path[len(PREFIXO_DETALHES):])
+            self._responder({"status": True, "data": [{
+                "numeroos": numeroos, "descricao": "TROCA DE ÓLEO", "quantidade": 1,
+                "valorunit": 150.0, "valortotal": 150.0,
+            }]})
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def busca_serial(numeros, base_url):
+    """Laço original do dashboard: uma OS por vez, token por chamada e sleep fixo de 50 ms."""
+    token = requests.post(f"{base_url}/auth/V1", json={"login": "x", "password": "x"}, timeout=10).json()["token"]
+    headers = {"Authorization": token}
+    detalhes = []
+    for numeroos in numeros:
+        response = requests.get(f"{base_url}{PREFIXO_DETALHES}{numeroos}", headers=headers, timeout=15)
+        if response.status_code == 200 and response.json().get("status"):
+            detalhes.append(response.json())
+        time.sleep(0.05)
+    return detalhes
+
+
+def busca_concorrente(numeros, base_url, workers, rate_limit):
+    auth = api_client.TokenManager("x", "x", base_url=base_url)
+    return api_client.fetch_os_details(numeros, auth, lambda msg: None,
+                                       max_workers=workers, rate_limit=rate_limit, base_url=base_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--os", type=int, default=200, help="quantidade de OS buscadas")
+    parser.add_argument("--latencia-ms", type=float, default=80.0, help="latência simulada por chamada")
+    parser.add_argument("--workers", type=int, default=api_client.DEFAULT_MAX_WORKERS)
+    parser.add_argument("--rate-limit", type=float, default=api_client.DEFAULT_RATE_LIMIT,
+                        help="requisições por segundo (0 = sem limite)")
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), criar_handler(args.latencia_ms / 1000))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    numeros = list(range(1, args.os + 1))
+
+    try:
+        inicio = time.perf_counter()
+        serial = busca_serial(numeros, base_url)
+        t_serial = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        concorrente = busca_concorrente(numeros, base_url, args.workers, args.rate_limit)
+        t_concorrente = time.perf_counter() - inicio
+    finally:
+        servidor.shutdown()
+
+    assert len(serial) == len(concorrente) == args.os
+    print(f"{args.os} OS, latência {args.latencia_ms:.0f} ms, {args.workers} workers, rate limit {args.rate_limit:g}/s")
+    print(f"serial:      {t_serial:7.2f} s ({args.os / t_serial:6.1f} OS/s)")
+    print(f"concorrente: {t_concorrente:7.2f} s ({args.os / t_concorrente:6.1f} OS/s)")
+    print(f"speedup:     {t_serial / t_concorrente:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
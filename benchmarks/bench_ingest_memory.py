@@ -0,0 +1,110 @@
+"""
+Benchmark de memória da ingestão do last-update num payload sintético (500k OS por padrão):
+pico de RSS do caminho original (texto inteiro + json + DataFrame de dicts) contra ingest.ler_historico
+(leitura em blocos e conversão em lotes). Cada modo roda num processo novo; o payload fica num arquivo temporário.
+Uso: python benchmarks/bench_ingest_memory.py [--os 500000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MODOS = ["base", "original", "streaming"]
+
+
+def gerar_payload(caminho: str, n: int, seed: int = 0):
+    """Escreve {"status": true, "data": [...]} registro a registro, sem montar a lista em memória."""
+    rng = random.Random(seed)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write('{"status": true, "data": [')
+        for i in range(n):
+            dia = 1 + i % 28
+            registro = {
+                "numeroos": str(100_000 + i),
+                "datahoraos": f"2024-{1 + i % 12:02d}-{dia:02d}T08:00:00",
+                "datahorainicio": f"2024-{1 + i % 12:02d}-{dia:02d}T09:30:00",
+                "datahorafim": f"2024-{1 + i % 12:02d}-{dia:02d}T17:45:00" if rng.random() > 0.3 else None,
+                "placaequipamento": f"ABC{rng.randrange(2000):04d}",
+                "marcaequipamento": rng.choice(["VOLVO", "SCANIA", "MERCEDES-BENZ", "IVECO"]),
+                "modeloequipamento": "FH 540", "hodometro": str(rng.randrange(10 ** 6)),
+                "titulomanutencao": rng.choice(["PREVENTIVA", "CORRETIVA", "PNEUS"]),
+                "tipomanutencao": "MECÂNICA", "status": rng.choice(["FINALIZADA", "ABERTA"]),
+                "motoristaresponsavel": f"MOTORISTA {rng.randrange(800)}",
+                "mecanicoresponsavel": f"MECÂNICO {rng.randrange(40)}",
+                "descricaoos": "TROCA DE ÓLEO, FILTROS E REVISÃO GERAL DO SISTEMA DE FREIOS",
+                "fornecedor": "OFICINA CENTRAL", "lastupdate": "2024-12-31T23:59:00",
+            }
+            f.write(("," if i else "") + json.dumps(registro, ensure_ascii=False))
+        f.write("]}")
+
+
+def executar_modo(modo: str, caminho: str):
+    """Executado no processo filho: carrega o histórico e imprime linhas, segundos e pico de RSS (MB)."""
+    import pandas as pd
+
+    import ingest
+
+    inicio = time.perf_counter()
+    if modo == "original":
+        # Como antes: resposta inteira em memória, response.json() e DataFrame a partir da lista de dicts
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        dados = json.loads(conteudo.decode("utf-8"))
+        df = pd.DataFrame(dados["data"])
+        df["numeroos"] = df["numeroos"].astype(int)
+        for col in ingest.HISTORICO_DATETIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    elif modo == "streaming":
+        with open(caminho, "rb") as f:
+            df = ingest.ler_historico(iter(lambda: f.read(ingest.CHUNK_SIZE), b""))
+    else:
+        df = pd.DataFrame()
+    segundos = time.perf_counter() - inicio
+    # Linux: ru_maxrss em KB
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{len(df)} {segundos:.3f} {pico_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--os", type=int, default=500_000)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        executar_modo(args.modo, args.payload)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "last-update.json")
+        gerar_payload(caminho, args.os)
+        tamanho_mb = os.path.getsize(caminho) / 2 ** 20
+        print(f"payload: {args.os} OS, {tamanho_mb:.0f} MB")
+        print(f"{'modo':<10} {'linhas':>8} {'tempo (s)':>10} {'pico RSS (MB)':>14}")
+        picos = {}
+        for modo in MODOS:
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--modo", modo, "--payload", caminho],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            linhas, segundos, picos[modo] = int(saida[0]), float(saida[1]), float(saida[2])
+            print(f"{modo:<10} {linhas:>8} {segundos:>10.2f} {picos[modo]:>14.1f}")
+
+    # "base" = processo só com os imports: o acréscimo de cada modo desconta esse custo fixo
+    extra_original = picos["original"] - picos["base"]
+    extra_streaming = picos["streaming"] - picos["base"]
+    print(f"acréscimo sobre a base: original {extra_original:.0f} MB, streaming {extra_streaming:.0f} MB "
+          f"({1 - extra_streaming / extra_original:.0%} menor)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark dos cards por rerun numa frota sintética: expressões originais (filtros e dropna repetidos
+por card) contra kpis.calcular_kpis, para os cards gerais e os cards de uma placa.
+Uso: python benchmarks/bench_kpis.py [--tamanhos 1000 100000 1000000] [--placas 2000] [--repeticoes 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kpis  # noqa: E402
+from data_processing import classify_os_status  # noqa: E402
+
+
+def gerar_frota(n: int, placas: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    inicio = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700 * 24, n), unit="h")
+    fim = inicio + pd.to_timedelta(rng.integers(1, 240, n), unit="h")
+    df = pd.DataFrame({
+        "numeroos": np.arange(1, n + 1),
+        "datahorainicio": pd.Series(inicio).where(rng.random(n) > 0.1),
+        "datahorafim": pd.Series(fim).where(rng.random(n) > 0.3),
+        "status": rng.choice(["FINALIZADA", "ABERTA", "CANCELADA"], n, p=[0.7, 0.2, 0.1]),
+        "valortotal": np.where(rng.random(n) > 0.4, rng.uniform(50, 5000, n).round(2), 0.0),
+        "placaequipamento": pd.Categorical(rng.integers(0, placas, n).astype(str)),
+        "motoristaresponsavel": pd.Categorical(rng.integers(0, placas // 2 + 1, n).astype(str)),
+    })
+    df["Situação da OS"] = classify_os_status(df)
+    return df
+
+
+def cards_originais(df: pd.DataFrame, df_placa: pd.DataFrame):
+    """Expressões dos cards antes do kpis.py (cards gerais + cards da placa)."""
+    gerais = (
+        df['numeroos'].nunique(),
+        df[(df['datahorafim'].notna()) & (df['status'].fillna('').str.strip().str.upper() == 'FINALIZADA')]['numeroos'].nunique(),
+        df[df['valortotal'] == 0]['numeroos'].nunique(),
+        df['valortotal'].sum(),
+        df[df['valortotal'] > 0]['valortotal'].mean() if not df[df['valortotal'] > 0].empty else 0,
+        df['placaequipamento'].nunique(),
+        int(((df.dropna(subset=['datahorainicio', 'datahorafim'])['datahorafim'] - df.dropna(subset=['datahorainicio', 'datahorafim'])['datahorainicio']).dt.total_seconds() / (24*3600)).mean()) if not df.dropna(subset=['datahorainicio', 'datahorafim']).empty else 0
+    )
+    placa = (
+        df_placa['numeroos'].nunique(),
+        df_placa[df_placa['valortotal'] > 0]['numeroos'].nunique(),
+        df_placa['valortotal'].sum(),
+        df_placa[df_placa['valortotal'] > 0]['valortotal'].mean() if not df_placa[df_placa['valortotal'] > 0].empty else 0,
+        int(((df_placa.dropna(subset=['datahorainicio', 'datahorafim'])['datahorafim'] - df_placa.dropna(subset=['datahorainicio', 'datahorafim'])['datahorainicio']).dt.total_seconds() / (24 * 3600)).mean()) if not df_placa.dropna(subset=['datahorainicio', 'datahorafim']).empty else 0,
+        df_placa['motoristaresponsavel'].nunique()
+    )
+    return gerais, placa
+
+
+def cards_kpis(df: pd.DataFrame, df_placa: pd.DataFrame):
+    k, p = kpis.calcular_kpis(df), kpis.calcular_kpis(df_placa)
+    gerais = (k.total_os, k.os_finalizadas, k.os_sem_valorizacao, k.custo_total, k.custo_medio, k.veiculos, k.tempo_medio_dias)
+    placa = (p.total_os, p.os_valorizadas, p.custo_total, p.custo_medio, p.tempo_medio_dias, p.motoristas)
+    return gerais, placa
+
+
+def cronometrar(func, repeticoes: int) -> float:
+    """Menor tempo (s) entre as repetições."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--placas", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'OS':>10} {'original (ms)':>14} {'kpis (ms)':>10} {'speedup':>8}")
+    for n in args.tamanhos:
+        df = gerar_frota(n, args.placas)
+        df_placa = df[df["placaequipamento"] == df["placaequipamento"].iloc[0]]
+        original, novo = cards_originais(df, df_placa), cards_kpis(df, df_placa)
+        assert np.allclose(original[0], novo[0]) and np.allclose(original[1], novo[1])
+        t_original = cronometrar(lambda: cards_originais(df, df_placa), args.repeticoes)
+        t_kpis = cronometrar(lambda: cards_kpis(df, df_placa), args.repeticoes)
+        print(f"{n:>10} {t_original * 1000:>14.1f} {t_kpis * 1000:>10.1f} {t_original / t_kpis:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
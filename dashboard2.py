@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
 import json
+import math
 import altair as alt
 import requests
 import os
 import time
-import threading
-from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+import api_client
+import data_processing
+import data_store
+import ingest
+import database
+import kpis
+import refresh_service
+import snapshot
+import sync
 
 # --- Configuração Inicial da Página e Estado da Sessão ---
 st.set_page_config(layout="wide")
@@ -14,6 +23,22 @@ st.set_page_config(layout="wide")
 CONFIG_FILE = "config.json"
 LOGO_URL = "https://github.com/WRSouza93/dashboard-manutencao/blob/main/Translek.png?raw=true"
 
+# Loaders usam a versão do repositório como chave de cache; poucas versões ficam em memória.
+# Os DataFrames devolvidos são compartilhados entre sessões (sem cópia por rerun) e não devem ser alterados.
+LOADER_CACHE_ENTRIES = 2
+LOADER_CACHE_TTL = 6 * 3600
+# Motoristas exibidos por página na seção "ORDENS DE SERVIÇO POR MOTORISTA E PLACA"
+MOTORISTAS_POR_PAGINA = 20
+# Tabela geral: opções de linhas por página e tamanho do trecho de descrição exibido na grade
+TABELA_LINHAS_POR_PAGINA = [25, 50, 100, 200]
+DESCRICAO_MAX_CARACTERES = 120
+# Sugestões exibidas na pesquisa de OS da sidebar (números que começam com o trecho digitado)
+OS_SUGESTOES = 50
+# Dados do banco são relidos a cada DB_CACHE_TTL segundos (a "versão" é a janela de tempo)
+DB_CACHE_TTL = 300
+# Intervalo (segundos) de atualização do status/contador do agendador na página de configurações
+SCHEDULER_STATUS_REFRESH_SECONDS = 1
+
 # MAPEAMENTO DE MESES EM PORTUGUÊS
 MONTHS_PT = {
     1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr", 
@@ -32,6 +57,16 @@ def load_config():
             config['interval_dashboard'] = config.get('interval', 5)
         if 'interval_andamento' not in config:
             config['interval_andamento'] = 5
+        if 'details_max_workers' not in config:
+            config['details_max_workers'] = api_client.DEFAULT_MAX_WORKERS
+        if 'details_rate_limit' not in config:
+            config['details_rate_limit'] = api_client.DEFAULT_RATE_LIMIT
+        if 'sync_overlap_days' not in config:
+            config['sync_overlap_days'] = sync.DEFAULT_OVERLAP_DAYS
+        if 'database_enabled' not in config:
+            config['database_enabled'] = False
+        if 'details_refetch_open' not in config:
+            config['details_refetch_open'] = True
         # Remove campo antigo se existir
         if 'interval' in config:
             del config['interval']
@@ -40,7 +75,12 @@ def load_config():
         'login': '',
         'password': '',
         'interval_dashboard': 5,
-        'interval_andamento': 5
+        'interval_andamento': 5,
+        'details_max_workers': api_client.DEFAULT_MAX_WORKERS,
+        'details_rate_limit': api_client.DEFAULT_RATE_LIMIT,
+        'sync_overlap_days': sync.DEFAULT_OVERLAP_DAYS,
+        'database_enabled': False,
+        'details_refetch_open': True
     }
 
 def save_config():
@@ -52,39 +92,69 @@ def save_config():
 # --- Inicialização do Estado da Sessão ---
 if 'config' not in st.session_state:
     st.session_state.config = load_config()
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = "Nenhuma atualização automática ainda."
-if 'scheduler_running' not in st.session_state:
-    st.session_state.scheduler_running = False
-if 'scheduler_thread' not in st.session_state:
-    st.session_state.scheduler_thread = None
-if 'update_log' not in st.session_state:
-    st.session_state.update_log = "Aguardando início do agendador."
-if 'next_update_time' not in st.session_state:
-    st.session_state.next_update_time = None
-if 'api_data' not in st.session_state:
-    st.session_state.api_data = None
-if 'api_details' not in st.session_state:
-    st.session_state.api_details = None
+
+# --- Repositório de Dados Compartilhado (um por processo, lido por todas as sessões) ---
+@st.cache_resource
+def get_store():
+    return data_store.DatasetStore()
+
+@st.cache_resource
+def get_auth(login, password):
+    """Token da API compartilhado pelo processo (um por login), reutilizado até perto de expirar."""
+    return api_client.TokenManager(login, password)
 
 # --- Funções de Lógica de Negócio (API e Dados) ---
-def _get_token(login, password, log_callback):
-    """Obtém o token de autenticação da API."""
+def _get_auth(login, password, log_callback):
+    """Retorna o gerenciador de token já autenticado (sem novo login se o token em cache ainda vale)."""
+    auth = get_auth(login, password)
     try:
-        auth_url = "https://yjlcmonbid.execute-api.us-east-1.amazonaws.com/auth/V1"
-        auth_payload = {"login": login, "password": password}
-        auth_response = requests.post(auth_url, json=auth_payload, timeout=10)
-        auth_response.raise_for_status()
-        auth_data = auth_response.json()
-        token = auth_data.get("token")
-        if not token:
-            log_callback("Erro de autenticação: Token não encontrado na resposta.")
-            return None
-        return token
-    except requests.exceptions.RequestException as e:
+        auth.token()
+        return auth
+    except (requests.exceptions.RequestException, ValueError) as e:
         log_callback(f"Erro de autenticação: {e}")
         return None
 
+def _fetch_historico(auth, config, log_callback):
+    """
+    Busca no last-update apenas o que mudou desde a marca d'água (menos a margem de segurança)
+    e mescla no histórico do repositório compartilhado por numeroos.
+    """
+    store = get_store()
+    existing = store.historico if store.has_historico else None
+    watermark = store.sync_watermark if existing is not None else None
+    since = sync.since_date(watermark, config.get('sync_overlap_days', sync.DEFAULT_OVERLAP_DAYS))
+
+    data_url = f"{api_client.API_BASE_URL}/os/V1/find/last-update/{since}"
+    # Streaming: o payload é convertido registro a registro em colunas, sem montar a árvore de dicts.
+    # GET condicional: se a API responder 304, o delta desta URL já foi mesclado
+    data_response = api_client.get_with_retry(data_url, auth, timeout=60, stream=True,
+                                              conditional=existing is not None)
+    if data_response is None:
+        raise requests.exceptions.ConnectionError("Falha de conexão ao buscar o histórico.")
+    if data_response.status_code == 304:
+        data_response.close()
+        log_callback(f"Histórico sem alterações desde {since}.")
+        return
+    if not data_response.ok:
+        data_response.close()
+    data_response.raise_for_status()
+    delta = ingest.historico_da_resposta(data_response)
+
+    merged, changed = sync.merge_by_numeroos(existing, delta)
+    # Índice das OS em andamento: só o delta é percorrido (carga completa: o histórico recebido)
+    if existing is None or store.andamento is None:
+        andamento = sync.em_andamento(merged)
+    else:
+        andamento = sync.atualizar_andamento(store.andamento, delta)
+    delta_watermark = sync.compute_watermark(delta)
+    if delta_watermark is not None and (watermark is None or delta_watermark > watermark):
+        watermark = delta_watermark
+
+    # Publica o histórico no repositório compartilhado
+    store.publish(historico=merged, andamento=andamento, sync_watermark=watermark)
+    api_client.guardar_validadores(data_url, data_response)
+    log_callback(f"Histórico sincronizado desde {since}: {len(delta)} registros recebidos, {len(changed)} OS novas ou alteradas.")
+
 # NOVA FUNÇÃO: Busca apenas histórico (para página OS em Andamento)
 def fetch_historico_only(config, log_callback):
     """Busca apenas os dados de histórico da API (sem detalhes)."""
@@ -95,187 +165,341 @@ def fetch_historico_only(config, log_callback):
         return False
 
     log_callback("Iniciando atualização do histórico...")
-    token = _get_token(login, password, log_callback)
-    if not token: 
+    auth = _get_auth(login, password, log_callback)
+    if not auth: 
         return False
 
     try:
         log_callback("Carregando histórico...")
-        data_url = "https://yjlcmonbid.execute-api.us-east-1.amazonaws.com/os/V1/find/last-update/2020-01-01"
-        headers = {"Authorization": token}
-        data_response = requests.get(data_url, headers=headers, timeout=60)
-        data_response.raise_for_status()
-        historico_data = data_response.json()
-        
-        # Armazena dados no session_state
-        st.session_state.api_data = historico_data
-        log_callback("Histórico carregado com sucesso!")
+        _fetch_historico(auth, config, log_callback)
         return True
     except Exception as e:
         log_callback(f"Erro ao buscar histórico: {e}")
         return False
 
 def fetch_api_data_online(config, log_callback):
-    """Busca os dados da API e armazena no session_state (histórico + detalhes)."""
+    """Busca os dados da API e publica no repositório compartilhado (histórico + detalhes)."""
     login, password = config.get('login'), config.get('password')
-    st.session_state.next_update_time = None # Reseta o contador no início da atualização
 
     if not all([login, password]):
         log_callback("Erro: Login e senha devem estar configurados no config.json.")
         return False
 
     log_callback("Iniciando atualização... Obtendo token...")
-    token = _get_token(login, password, log_callback)
-    if not token: 
+    auth = _get_auth(login, password, log_callback)
+    if not auth: 
         return False
 
     try:
         log_callback("Carregando histórico...")
-        data_url = "https://yjlcmonbid.execute-api.us-east-1.amazonaws.com/os/V1/find/last-update/2020-01-01"
-        headers = {"Authorization": token}
-        data_response = requests.get(data_url, headers=headers, timeout=60)
-        data_response.raise_for_status()
-        historico_data = data_response.json()
-        
-        # Armazena dados no session_state
-        st.session_state.api_data = historico_data
-        log_callback("Histórico carregado com sucesso.")
+        _fetch_historico(auth, config, log_callback)
     except Exception as e:
         log_callback(f"Erro ao buscar histórico: {e}")
         return False
 
-    all_details = []
     try:
-        os_list = historico_data.get("data", [])
-        total = len(os_list)
-        log_callback(f"Encontradas {total} OS. Buscando detalhes...")
+        store = get_store()
+        historico = store.historico
+        usar_banco = config.get('database_enabled', False) and _banco_pronto(log_callback)
+        # Detalhes já obtidos: em memória nesta execução e, com o banco ativo, os gravados em detalhesOS
+        gravados = _detalhes_sincronizados_no_banco(log_callback) if usar_banco else {}
+        plano = sync.planejar_detalhes(historico, {**gravados, **store.details_lastupdate},
+                                       refetch_abertas=config.get('details_refetch_open', True))
+        log_callback(f"Planejamento dos detalhes: {plano.resumo()}. Buscando detalhes...")
         
-        for i, os_item in enumerate(os_list):
-            if (i + 1) % 20 == 0:
-                log_callback(f"Carregando detalhes... {i+1} de {total} OS")
-            
-            numeroos = os_item.get("numeroos")
-            if numeroos:
-                details_url = f"https://yjlcmonbid.execute-api.us-east-1.amazonaws.com/os/V1/find/os-details/{numeroos}"
-                response = requests.get(details_url, headers=headers, timeout=15)
-                if response.status_code == 200 and response.json().get("status"):
-                    all_details.append(response.json())
-                time.sleep(0.05)
+        novos_detalhes = api_client.fetch_os_details(
+            plano.numeros, auth, log_callback,
+            max_workers=config.get('details_max_workers', api_client.DEFAULT_MAX_WORKERS),
+            rate_limit=config.get('details_rate_limit', api_client.DEFAULT_RATE_LIMIT),
+        )
+        lastupdate_por_os = sync.lastupdate_por_os(historico)
+        # OS ignoradas cujos detalhes só existem no banco (ex.: após reiniciar o processo) são lidas de lá
+        a_consultar = set(plano.numeros)
+        do_banco = [n for n in gravados
+                    if n in lastupdate_por_os and n not in store.details_lastupdate and n not in a_consultar]
+        detalhes_banco = _carregar_detalhes_do_banco(do_banco, log_callback)
         
-        # Armazena detalhes no session_state
-        st.session_state.api_details = all_details
-        log_callback(f"Atualização completa! {len(all_details)} detalhes carregados.")
-        st.session_state.last_update = time.strftime('%d/%m/%Y %H:%M:%S')
+        all_details = sync.merge_details(store.api_details or [], {**detalhes_banco, **novos_detalhes})
+        details_lastupdate = {**store.details_lastupdate,
+                              **{n: lastupdate_por_os.get(n) for n in do_banco},
+                              **{n: lastupdate_por_os.get(n) for n in novos_detalhes}}
+        if usar_banco:
+            _gravar_detalhes_no_banco(historico, novos_detalhes, log_callback)
         
-        # Usa intervalo do dashboard por padrão
-        interval_seconds = config.get('interval_dashboard', 5) * 60
-        st.session_state.next_update_time = time.time() + interval_seconds
+        sync_report = {
+            "horario": time.strftime('%d/%m/%Y %H:%M:%S'),
+            "total_os": plano.total,
+            "novas": plano.novas,
+            "alteradas": plano.alteradas,
+            "nao_finalizadas": plano.abertas,
+            "consultadas": len(plano.numeros),
+            "falhas": len(plano.numeros) - len(novos_detalhes),
+            "chamadas_evitadas": plano.ignoradas,
+            "lidas_do_banco": len(do_banco),
+        }
+        # Publica os detalhes no repositório compartilhado
+        store.publish(api_details=all_details, details_lastupdate=details_lastupdate,
+                      last_update=sync_report["horario"], sync_report=sync_report)
+        _salvar_snapshot(log_callback)
+        log_callback(f"Atualização completa! {len(all_details)} detalhes carregados; "
+                     f"{plano.ignoradas} consultas de OS finalizadas sem alteração evitadas.")
         return True
     except Exception as e:
         log_callback(f"Erro ao buscar detalhes: {e}")
         return False
 
-def scheduler_log_callback(message):
-    st.session_state.update_log = message
+@st.cache_resource
+def preparar_banco():
+    """Cria as tabelas e aplica as migrações pendentes (schema v3: detalhessync, v4: os_mensal) uma vez por processo."""
+    database.init_db()
+    return True
 
-def scheduler_loop():
-    """Loop que executa a atualização de dados em intervalos definidos."""
-    while st.session_state.get('scheduler_running', False):
-        fetch_api_data_online(st.session_state.config, scheduler_log_callback)
-        st.cache_data.clear()
-        
-        # Usa intervalo do dashboard para o agendador
-        interval_seconds = st.session_state.config.get('interval_dashboard', 5) * 60
-        for _ in range(interval_seconds):
-            if not st.session_state.get('scheduler_running', False): break
-            time.sleep(1)
-
-@st.cache_data
-def load_data_from_session():
-    """Carrega os dados do session_state e os processa (histórico + detalhes)."""
-    if not st.session_state.api_data or not st.session_state.api_details:
+def _banco_pronto(log_callback):
+    """Banco no schema atual (init_db na primeira chamada do processo); False se não for possível prepará-lo."""
+    try:
+        return preparar_banco()
+    except Exception as e:
+        log_callback(f"Aviso: não foi possível preparar o banco de dados: {e}")
+        return False
+
+def _detalhes_sincronizados_no_banco(log_callback):
+    """{numeroos: lastupdate} das OS com detalhes gravados no banco; vazio se o banco falhar."""
+    try:
+        return database.listar_detalhes_sincronizados()
+    except Exception as e:
+        log_callback(f"Aviso: não foi possível consultar os detalhes gravados no banco: {e}")
+        return {}
+
+def _carregar_detalhes_do_banco(numeros, log_callback):
+    """Detalhes gravados no banco no formato da resposta os-details ({numeroos: resposta})."""
+    if not numeros:
+        return {}
+    try:
+        df_detalhes = database.buscar_detalhes_df()
+    except Exception as e:
+        log_callback(f"Aviso: não foi possível ler os detalhes gravados no banco: {e}")
+        return {}
+    df_detalhes = df_detalhes[df_detalhes['numeroos'].isin(numeros)]
+    df_detalhes = df_detalhes.astype(object).where(df_detalhes.notna(), None)
+    return {
+        numeroos: {"status": True, "data": grupo.to_dict("records")}
+        for numeroos, grupo in df_detalhes.groupby('numeroos', sort=False)
+    }
+
+def _gravar_detalhes_no_banco(historico, novos_detalhes, log_callback):
+    """Grava no banco as OS finalizadas consultadas agora e seus detalhes, marcando-as como sincronizadas."""
+    try:
+        registros = [r for r in sync.registros_os(historico, list(novos_detalhes)) if database.os_atende_criterios(r)]
+        if not registros:
+            return
+        numeros = [r['numeroos'] for r in registros]
+        # Meses do resumo os_mensal afetados: os de abertura gravados antes e os novos
+        meses = database.meses_das_os(numeros) | {r.get('datahoraos') for r in registros}
+        database.inserir_os_lote(registros)
+        database.inserir_detalhes_lote({
+            n: [item for item in (novos_detalhes[n].get('data') or []) if item is not None]
+            if novos_detalhes[n].get('status') else []
+            for n in numeros
+        })
+        database.marcar_detalhes_sincronizados(numeros)
+        database.atualizar_os_mensal(list(meses))
+    except Exception as e:
+        log_callback(f"Aviso: não foi possível gravar os detalhes no banco: {e}")
+
+def _salvar_snapshot(log_callback):
+    """Grava em disco o conjunto processado da versão atual (abertura rápida após restart)."""
+    try:
+        version = get_store().version
+        df, df_detalhes = load_data_from_session(version)
+        if df is not None:
+            snapshot.salvar_snapshot(df, df_detalhes, version)
+    except Exception as e:
+        log_callback(f"Aviso: não foi possível gravar o snapshot local: {e}")
+
+# --- Serviço de Atualização (um por processo, independente das sessões) ---
+@st.cache_resource
+def get_refresh_service():
+    """
+    Agendador único do processo. Lê o config.json a cada execução (não depende de nenhuma sessão),
+    então continua atualizando mesmo sem nenhuma página aberta.
+    """
+    return refresh_service.RefreshService(
+        refresh=lambda log_callback: fetch_api_data_online(load_config(), log_callback),
+        interval_seconds=lambda: load_config().get('interval_dashboard', 5) * 60,
+    )
+
+@st.cache_resource
+def get_memory_reports():
+    """Relatório de memória (antes/depois do esquema de tipos) da última carga de cada fonte de dados."""
+    return {}
+
+def _otimizar_tipos(fonte, df):
+    """Aplica o esquema de tipos do DataFrame de OS e registra o relatório de memória da fonte."""
+    otimizado = data_processing.otimizar_tipos(df)
+    get_memory_reports()[fonte] = data_processing.relatorio_memoria(df, otimizado)
+    return otimizado
+
+@st.cache_resource(max_entries=LOADER_CACHE_ENTRIES, ttl=LOADER_CACHE_TTL)
+def load_data_from_session(version):
+    """
+    Carrega os dados do repositório compartilhado e os processa (histórico + detalhes).
+    `version` é a versão do repositório e serve de chave do cache: sessões na mesma versão compartilham
+    os mesmos DataFrames, que não devem ser alterados.
+    """
+    store = get_store()
+    if not store.has_detalhes:
         return None, None
     
-    # Processa dados do histórico
-    df_historico = pd.DataFrame(st.session_state.api_data['data'])
+    # Histórico já chega tipado da ingestão (numeroos inteiro, colunas de data)
+    df_historico = store.historico
     
     # Processa dados dos detalhes
-    all_detalhes = [item for entry in st.session_state.api_details if entry.get('data') and entry['data'][0] is not None for item in entry['data']]
+    all_detalhes = [item for entry in store.api_details if entry.get('data') and entry['data'][0] is not None for item in entry['data']]
     df_detalhes = pd.DataFrame(all_detalhes)
     
     # Processamento dos dados
-    df_historico['numeroos'] = df_historico['numeroos'].astype(int)
     df_detalhes.dropna(subset=['numeroos'], inplace=True)
     df_detalhes['numeroos'] = df_detalhes['numeroos'].astype(int)
     for col in ['quantidade', 'valorunit', 'valortotal']:
         df_detalhes[col] = pd.to_numeric(df_detalhes[col], errors='coerce')
-    df_detalhes.fillna(0, inplace=True)
+    # Só as colunas numéricas: material vazio continua vazio (e é descartado na exibição)
+    df_detalhes.fillna({'quantidade': 0, 'valorunit': 0, 'valortotal': 0}, inplace=True)
     detalhes_agg = df_detalhes.groupby('numeroos').agg(valortotal=('valortotal', 'sum')).reset_index()
     df_merged = pd.merge(df_historico, detalhes_agg, on='numeroos', how='left')
-    df_merged['valortotal'].fillna(0, inplace=True)
-    for col in ['datahoraos', 'datahorainicio', 'datahorafim']:
-        df_merged[col] = pd.to_datetime(df_merged[col], errors='coerce')
+    df_merged['valortotal'] = df_merged['valortotal'].fillna(0)
+    df_merged = _otimizar_tipos('api', df_merged)
+    df_merged['Situação da OS'] = data_processing.classify_os_status(df_merged)
     return df_merged, df_detalhes
 
-# NOVA FUNÇÃO: Carrega apenas dados do histórico (para página OS em Andamento)
-@st.cache_data
-def load_historico_only():
-    """Carrega apenas os dados do histórico do session_state."""
-    if not st.session_state.api_data:
+@st.cache_resource(max_entries=1)
+def load_snapshot(tag):
+    """
+    Snapshot local `tag` lido uma vez por processo; usado só enquanto a API não foi carregada.
+    Um snapshot mais novo substitui o anterior no cache, que é limpo quando os dados da API chegam.
+    Os DataFrames são compartilhados entre sessões e não devem ser alterados.
+    """
+    return snapshot.carregar_snapshot()
+
+def _dados_snapshot(dados_api):
+    """Snapshot atual (ou None); com os dados da API carregados, libera o snapshot do cache."""
+    if dados_api:
+        load_snapshot.clear()
         return None
-    
-    # Processa dados do histórico
-    df_historico = pd.DataFrame(st.session_state.api_data['data'])
-    
-    # Processamento básico dos dados
-    df_historico['numeroos'] = df_historico['numeroos'].astype(int)
-    for col in ['datahoraos', 'datahorainicio', 'datahorafim']:
-        df_historico[col] = pd.to_datetime(df_historico[col], errors='coerce')
-    
-    return df_historico
-
-def classify_os_status(row):
-    is_valorizado = row.get('valortotal', 0) > 0
-    status_str = str(row.get('status', '')).strip().upper()
-    is_finalizada = pd.notna(row['datahorafim']) and status_str == 'FINALIZADA'
-    if is_valorizado and is_finalizada: return "VALORIZADO E FINALIZADO"
-    if pd.notna(row['datahorainicio']) and pd.isna(row['datahorafim']): return "ANDAMENTO"
-    if is_valorizado and pd.isna(row['datahorafim']): return "EXECUTADO"
-    if is_finalizada: return "FINALIZADA"
-    if pd.isna(row['datahorainicio']) and pd.isna(row['datahorafim']): return "EM BRANCO"
-    return "OUTRO"
+    meta = snapshot.snapshot_atual()
+    return load_snapshot(meta['tag']) if meta else None
 
-def apply_filters(df, anos_selecionados, meses_selecionados, os_selecionadas, marca_selecionada, 
-                 placa_selecionada_filtro, tipo_manutencao_selecionado, situacao_selecionada, 
-                 motorista_selecionado):
-    """Aplica filtros ao DataFrame."""
-    df_filtered = df.copy()
+def _db_version():
+    """Versão dos dados do banco: muda a cada DB_CACHE_TTL segundos."""
+    return int(time.time() // DB_CACHE_TTL)
+
+@st.cache_resource(max_entries=LOADER_CACHE_ENTRIES, ttl=LOADER_CACHE_TTL)
+def load_data_from_db(version):
+    """
+    Carrega OS e detalhes persistidos no MySQL (soma de valortotal por OS feita no banco).
+    Cache por `version`, compartilhado entre sessões: os DataFrames não devem ser alterados.
+    """
+    df_os = database.buscar_os_df()
+    if df_os.empty:
+        return None, None
+    df_detalhes = database.buscar_detalhes_df()
+    df_os['numeroos'] = df_os['numeroos'].astype(int)
+    df_detalhes['numeroos'] = df_detalhes['numeroos'].astype(int)
+    df_detalhes.fillna({col: 0 for col in database.DETALHES_DECIMAL_COLUMNS}, inplace=True)
+    df_os = _otimizar_tipos('banco', df_os)
+    df_os['Situação da OS'] = data_processing.classify_os_status(df_os)
+    return df_os, df_detalhes
+
+@st.cache_resource(max_entries=LOADER_CACHE_ENTRIES, ttl=LOADER_CACHE_TTL)
+def load_andamento(version):
+    """
+    OS em andamento para a página OS em Andamento, a partir do índice mantido pela sincronização
+    (cache por `version`, compartilhado entre sessões; não deve ser alterado):
+    só essas linhas são tipadas e classificadas, não o histórico inteiro.
+    """
+    store = get_store()
+    if not store.has_historico:
+        return None
+    andamento = store.andamento if store.andamento is not None else sync.em_andamento(store.historico)
+    df_andamento = _otimizar_tipos('andamento', andamento)
     
-    # APLICAR FILTRO DE ANO (multiselect)
+    # Situação das OS (sem valortotal dos detalhes)
+    df_andamento['Situação da OS'] = data_processing.classify_os_status(df_andamento)
+    return df_andamento
+
+@st.cache_resource(max_entries=2 * LOADER_CACHE_ENTRIES)
+def get_filter_index(fonte, version, _df):
+    """Índice de filtros de uma fonte de dados ('api', 'andamento', 'banco') numa versão; compartilhado entre sessões."""
+    return data_processing.FilterIndex(_df)
+
+@st.cache_resource(max_entries=2 * LOADER_CACHE_ENTRIES)
+def get_opcoes_filtros(fonte, version, _df):
+    """Opções dos filtros da sidebar de uma fonte de dados numa versão; compartilhadas entre sessões."""
+    return data_processing.opcoes_filtros(_df)
+
+@st.cache_resource(max_entries=2 * LOADER_CACHE_ENTRIES)
+def get_detalhes_index(fonte, version, _df_detalhes):
+    """Detalhes ordenados por numeroos de uma fonte de dados numa versão; compartilhado entre sessões."""
+    return data_processing.DetalhesIndex(_df_detalhes)
+
+@st.cache_resource(max_entries=2 * LOADER_CACHE_ENTRIES)
+def get_rollup_mensal(fonte, version, _df):
+    """
+    Tabela fato mensal do gráfico REGISTRO DE OS de uma fonte numa versão; compartilhada entre sessões.
+    Na fonte 'banco' vem do resumo os_mensal mantido pela sincronização.
+    None se houver OS repetidas (a contagem de OS distintas precisa das linhas).
+    """
+    if not _df['numeroos'].is_unique:
+        return None
+    if fonte == 'banco':
+        try:
+            fatos = database.buscar_os_mensal().rename(columns={'situacao': 'Situação da OS'})
+            if not fatos.empty:
+                return data_processing.RollupMensal(fatos)
+        except Exception as e:
+            st.warning(f"Resumo mensal do banco indisponível ({e}); o gráfico usa os dados carregados.")
+    return data_processing.RollupMensal(data_processing.fatos_mensais(_df))
+
+def _filtro_os(numeros, key):
+    """
+    Pesquisa de OS na sidebar: o número é digitado e o multiselect recebe só as OS que começam
+    com o trecho (até OS_SUGESTOES) mais as já selecionadas, nunca a lista completa.
+    """
+    trecho = st.sidebar.text_input('Pesquisar OS', key=f"{key}_busca", placeholder="Digite o número da OS")
+    sugestoes = data_processing.buscar_numeros_os(numeros, trecho, limite=OS_SUGESTOES)
+    opcoes = sorted(set(st.session_state.get(key, [])) | set(sugestoes))
+    return st.sidebar.multiselect('OS selecionadas', opcoes, key=key)
+
+def _periodo_selecionado(anos_selecionados, meses_selecionados):
+    """Anos e meses (números) dos filtros de período; None quando 'Todos' ou nada selecionado."""
+    anos = None
     if anos_selecionados and 'Todos' not in anos_selecionados:
-        anos_numeros = [int(ano) for ano in anos_selecionados]
-        df_filtered = df_filtered[df_filtered['datahoraos'].dt.year.isin(anos_numeros)]
-    
-    # APLICAR FILTRO DE MÊS (multiselect)
+        anos = [int(ano) for ano in anos_selecionados]
+    meses = None
     if meses_selecionados and 'Todos' not in meses_selecionados:
-        meses_numeros = [k for k, v in MONTHS_PT.items() if v in meses_selecionados]
-        df_filtered = df_filtered[df_filtered['datahoraos'].dt.month.isin(meses_numeros)]
+        meses = [k for k, v in MONTHS_PT.items() if v in meses_selecionados]
+    return anos, meses
+
+def apply_filters(df, anos_selecionados, meses_selecionados, os_selecionadas, marca_selecionada, 
+                 placa_selecionada_filtro, tipo_manutencao_selecionado, situacao_selecionada, 
+                 motorista_selecionado, filter_index=None):
+    """
+    Aplica filtros ao DataFrame numa única máscara, usando o índice pré-calculado (ano/mês e códigos).
+    Sem filtros ativos, retorna o próprio DataFrame (sem cópia).
+    """
+    if filter_index is None or not filter_index.matches(df):
+        filter_index = data_processing.FilterIndex(df)
     
-    # APLICAR OUTROS FILTROS
-    if os_selecionadas: 
-        df_filtered = df_filtered[df_filtered['numeroos'].isin(os_selecionadas)]
-    if marca_selecionada: 
-        df_filtered = df_filtered[df_filtered['marcaequipamento'].isin(marca_selecionada)]
-    if placa_selecionada_filtro: 
-        df_filtered = df_filtered[df_filtered['placaequipamento'].isin(placa_selecionada_filtro)]
-    if tipo_manutencao_selecionado: 
-        df_filtered = df_filtered[df_filtered['titulomanutencao'].isin(tipo_manutencao_selecionado)]
-    if situacao_selecionada: 
-        df_filtered = df_filtered[df_filtered['Situação da OS'].isin(situacao_selecionada)]
-    if motorista_selecionado: 
-        df_filtered = df_filtered[df_filtered['motoristaresponsavel'].isin(motorista_selecionado)]
+    # FILTROS DE ANO E MÊS (multiselect; 'Todos' desativa o filtro)
+    anos, meses = _periodo_selecionado(anos_selecionados, meses_selecionados)
     
-    return df_filtered
+    posicoes = filter_index.select(anos, meses, os_selecionadas, {
+        'marcaequipamento': marca_selecionada,
+        'placaequipamento': placa_selecionada_filtro,
+        'titulomanutencao': tipo_manutencao_selecionado,
+        'Situação da OS': situacao_selecionada,
+        'motoristaresponsavel': motorista_selecionado,
+    })
+    return df if posicoes is None else df.iloc[posicoes]
 
 # --- Funções de Renderização de Página ---
 def render_dashboard_page():
@@ -294,69 +518,86 @@ def render_dashboard_page():
                 return
             log_placeholder = st.empty()
             with st.spinner("Atualizando..."):
-                success = fetch_api_data_online(st.session_state.config, log_callback=log_placeholder.info)
-                if success:
-                    st.cache_data.clear()
+                config = st.session_state.config
+                success = get_refresh_service().run(
+                    log_placeholder.info, refresh=lambda log_callback: fetch_api_data_online(config, log_callback))
+                if success is None:
+                    log_placeholder.info("Já existe uma atualização em andamento. Os dados aparecem assim que ela terminar.")
+                elif success:
                     log_placeholder.empty()
                     st.success("Dados atualizados com sucesso!")
                     st.rerun()
 
     with col2_sidebar:
         if st.button("Limpar Filtros"):
-            keys_to_keep = ['config', 'scheduler_running', 'scheduler_thread', 'last_update', 'update_log', 'next_update_time', 'api_data', 'api_details']
+            keys_to_keep = ['config']
             for key in list(st.session_state.keys()):
                 if key not in keys_to_keep: del st.session_state[key]
             st.rerun()
 
-    # Verifica se há dados carregados
-    if not st.session_state.api_data or not st.session_state.api_details:
+    # Verifica se há dados carregados: API > snapshot local > banco (se habilitado)
+    dados_api = get_store().has_detalhes
+    dados_snapshot = _dados_snapshot(dados_api)
+    usar_banco = (not dados_api and dados_snapshot is None and st.session_state.config.get('database_enabled', False)
+                  and _banco_pronto(st.warning))
+    if not dados_api and dados_snapshot is None and not usar_banco:
         st.warning("Nenhum dado carregado. Clique em 'Atualizar Dados' para buscar informações da API.")
         return
 
     try:
-        df, df_detalhes = load_data_from_session()
+        if dados_api:
+            fonte, version = 'api', get_store().version
+            df, df_detalhes = load_data_from_session(version)
+        elif dados_snapshot is not None:
+            df, df_detalhes, meta = dados_snapshot
+            fonte, version = 'snapshot', meta['tag']
+            st.caption(f"Exibindo snapshot local de {meta['criado_em']}. Os dados estão sendo atualizados em segundo plano.")
+            service = get_refresh_service()
+            if st.session_state.config.get('login') and st.session_state.config.get('password'):
+                service.trigger_once()
+        else:
+            fonte, version = 'banco', _db_version()
+            df, df_detalhes = load_data_from_db(version)
         if df is None:
-            st.error("Erro ao processar os dados da API.")
+            if usar_banco:
+                st.warning("Nenhum dado no banco. Clique em 'Atualizar Dados' para buscar informações da API.")
+            else:
+                st.error("Erro ao processar os dados da API.")
             return
-            
-        df['Situação da OS'] = df.apply(classify_os_status, axis=1)
+        if usar_banco:
+            st.caption("Exibindo dados persistidos no banco (OS finalizadas). Clique em 'Atualizar Dados' para buscar da API.")
         
         # FILTROS NA SIDEBAR (MULTISELECT)
-        anos = ['Todos'] + sorted(df['datahoraos'].dt.year.dropna().unique().astype(int), reverse=True)
+        # Opções calculadas uma vez por versão dos dados
+        opcoes = get_opcoes_filtros(fonte, version, df)
+        anos = ['Todos'] + opcoes['anos']
         anos_selecionados = st.sidebar.multiselect('Período (Ano)', anos, default=['Todos'])
         
         # FILTRO DE MÊS EM PORTUGUÊS (MULTISELECT)
-        meses_disponveis = sorted(df['datahoraos'].dt.month.dropna().unique().astype(int))
-        meses_opcoes = ['Todos'] + [MONTHS_PT[mes] for mes in meses_disponveis]
+        meses_opcoes = ['Todos'] + [MONTHS_PT[mes] for mes in opcoes['meses']]
         meses_selecionados = st.sidebar.multiselect('Mês', meses_opcoes, default=['Todos'])
         
-        os_list = sorted(df['numeroos'].dropna().unique().astype(int))
-        os_selecionadas = st.sidebar.multiselect('Pesquisar OS', os_list)
-        marcas = sorted(df['marcaequipamento'].dropna().unique())
-        marca_selecionada = st.sidebar.multiselect('Marca', marcas)
-        placas = sorted(df['placaequipamento'].dropna().unique())
-        placa_selecionada_filtro = st.sidebar.multiselect('Placa', placas)
-        tipos_manutencao = sorted(df['titulomanutencao'].dropna().unique())
-        tipo_manutencao_selecionado = st.sidebar.multiselect('Tipo Manutenção', tipos_manutencao)
-        situacoes = sorted(df['Situação da OS'].dropna().unique())
-        situacao_selecionada = st.sidebar.multiselect('Situação', situacoes)
-        motoristas = sorted(df['motoristaresponsavel'].dropna().unique())
-        motorista_selecionado = st.sidebar.multiselect('Motorista', motoristas)
+        os_selecionadas = _filtro_os(opcoes['numeroos'], key="os_dashboard")
+        marca_selecionada = st.sidebar.multiselect('Marca', opcoes['marcaequipamento'])
+        placa_selecionada_filtro = st.sidebar.multiselect('Placa', opcoes['placaequipamento'])
+        tipo_manutencao_selecionado = st.sidebar.multiselect('Tipo Manutenção', opcoes['titulomanutencao'])
+        situacao_selecionada = st.sidebar.multiselect('Situação', opcoes['Situação da OS'])
+        motorista_selecionado = st.sidebar.multiselect('Motorista', opcoes['motoristaresponsavel'])
 
         # APLICAR FILTROS
         df_filtered = apply_filters(df, anos_selecionados, meses_selecionados, os_selecionadas, 
                                   marca_selecionada, placa_selecionada_filtro, tipo_manutencao_selecionado, 
-                                  situacao_selecionada, motorista_selecionado)
+                                  situacao_selecionada, motorista_selecionado,
+                                  filter_index=get_filter_index(fonte, version, df))
+        filtros_valores = {
+            'marcaequipamento': marca_selecionada,
+            'placaequipamento': placa_selecionada_filtro,
+            'titulomanutencao': tipo_manutencao_selecionado,
+            'Situação da OS': situacao_selecionada,
+            'motoristaresponsavel': motorista_selecionado,
+        }
         
-        total_os, os_finalizadas, os_sem_valorizacao, custo_total, custo_medio, veiculos_atendidos, tempo_medio_dias = (
-            df_filtered['numeroos'].nunique(),
-            df_filtered[(df_filtered['datahorafim'].notna()) & (df_filtered['status'].fillna('').str.strip().str.upper() == 'FINALIZADA')]['numeroos'].nunique(),
-            df_filtered[df_filtered['valortotal'] == 0]['numeroos'].nunique(),
-            df_filtered['valortotal'].sum(),
-            df_filtered[df_filtered['valortotal'] > 0]['valortotal'].mean() if not df_filtered[df_filtered['valortotal'] > 0].empty else 0,
-            df_filtered['placaequipamento'].nunique(),
-            int(((df_filtered.dropna(subset=['datahorainicio', 'datahorafim'])['datahorafim'] - df_filtered.dropna(subset=['datahorainicio', 'datahorafim'])['datahorainicio']).dt.total_seconds() / (24*3600)).mean()) if not df_filtered.dropna(subset=['datahorainicio', 'datahorafim']).empty else 0
-        )
+        kpi = kpis.calcular_kpis(df_filtered)
         
         # CSS para ajustar tamanho dos cards
         st.markdown("""
@@ -372,25 +613,26 @@ def render_dashboard_page():
         """, unsafe_allow_html=True)
         
         col1, col2, col3, col4, col5, col6, col7 = st.columns(7)
-        col1.metric("ORDENS DE SERVIÇO", f"{total_os}")
-        col2.metric("OS FINALIZADAS", f"{os_finalizadas}")
-        col3.metric("OS SEM VALORIZAÇÃO", f"{os_sem_valorizacao}")
-        col4.metric("CUSTO TOTAL", f"R$ {custo_total:,.2f}")
-        col5.metric("CUSTO MÉDIO", f"R$ {custo_medio:,.2f}")
-        col6.metric("VEÍCULOS ATENDIDOS", f"{veiculos_atendidos}")
-        col7.metric("DIAS DE ATENDIMENTO", f"{tempo_medio_dias}")
+        col1.metric("ORDENS DE SERVIÇO", f"{kpi.total_os}")
+        col2.metric("OS FINALIZADAS", f"{kpi.os_finalizadas}")
+        col3.metric("OS SEM VALORIZAÇÃO", f"{kpi.os_sem_valorizacao}")
+        col4.metric("CUSTO TOTAL", f"R$ {kpi.custo_total:,.2f}")
+        col5.metric("CUSTO MÉDIO", f"R$ {kpi.custo_medio:,.2f}")
+        col6.metric("VEÍCULOS ATENDIDOS", f"{kpi.veiculos}")
+        col7.metric("DIAS DE ATENDIMENTO", f"{kpi.tempo_medio_dias}")
 
         chart_col1, chart_col2 = st.columns(2)
         with chart_col1:
             st.header("REGISTRO DE OS")
-            df_charting = df_filtered.dropna(subset=['datahoraos']).copy()
-            if not df_charting.empty:
-                df_charting['Mês'] = df_charting['datahoraos'].dt.to_period('M').astype(str)
-                os_finalizadas_charting = df_charting[(df_charting['datahorafim'].notna()) & (df_charting['status'].fillna('').str.strip().str.upper() == 'FINALIZADA')]
-                os_geradas_mes = df_charting.groupby('Mês')['numeroos'].nunique()
-                os_finalizadas_mes = os_finalizadas_charting.groupby('Mês')['numeroos'].nunique()
-                os_valorizada_mes = df_charting[df_charting['valortotal'] > 0].groupby('Mês')['numeroos'].nunique()
-                chart_df = pd.DataFrame({'OS Geradas': os_geradas_mes, 'OS Finalizadas': os_finalizadas_mes, 'OS Valorizada': os_valorizada_mes}).fillna(0).astype(int)
+            # Tabela fato mensal (por versão); o filtro por número de OS não é dimensão dela e usa as linhas
+            rollup = get_rollup_mensal(fonte, version, df)
+            if os_selecionadas or rollup is None:
+                contagens = data_processing.contagens_mensais(df_filtered)
+            else:
+                contagens = rollup.contagens(
+                    *_periodo_selecionado(anos_selecionados, meses_selecionados), filtros_valores)
+            if not contagens.empty:
+                chart_df = contagens.rename(columns={'geradas': 'OS Geradas', 'finalizadas': 'OS Finalizadas', 'valorizadas': 'OS Valorizada'})
                 chart_df['OS Andamento'] = chart_df['OS Geradas'] - chart_df['OS Finalizadas']
                 chart_df = chart_df[['OS Geradas', 'OS Andamento', 'OS Finalizadas', 'OS Valorizada']]
                 chart_df_long = chart_df.reset_index().melt('Mês', var_name='Status', value_name='Quantidade')
@@ -402,7 +644,7 @@ def render_dashboard_page():
                 
         with chart_col2:
             st.header("SITUAÇÃO DA OS")
-            situacao_counts = df_filtered['Situação da OS'].value_counts().reset_index()
+            situacao_counts = df_filtered['Situação da OS'].value_counts().loc[lambda c: c > 0].reset_index()
             situacao_counts.columns = ['Situação', 'Quantidade']
             donut_chart = alt.Chart(situacao_counts).mark_arc(innerRadius=100).encode(theta=alt.Theta(field="Quantidade", type="quantitative"), color=alt.Color(field="Situação", type="nominal", title="Situação"), tooltip=['Situação', 'Quantidade']).properties(title='Distribuição das OS por Situação')
             st.altair_chart(donut_chart, use_container_width=True)
@@ -412,20 +654,20 @@ def render_dashboard_page():
         cat_col1, cat_col2 = st.columns(2)
         with cat_col1:
             st.subheader("POR TIPO DE MANUTENÇÃO")
-            manutencao_counts = df_filtered.fillna({'titulomanutencao': 'Não Informado'}).groupby('titulomanutencao')['numeroos'].nunique().sort_values(ascending=True).reset_index()
+            manutencao_counts = df_filtered.fillna({'titulomanutencao': 'Não Informado'}).groupby('titulomanutencao', observed=True)['numeroos'].nunique().sort_values(ascending=True).reset_index()
             manutencao_counts.columns = ['Tipo de Manutenção', 'Quantidade']
             chart = alt.Chart(manutencao_counts).mark_bar().encode(x=alt.X('Quantidade:Q', title='Quantidade de OS'), y=alt.Y('Tipo de Manutenção:N', sort='-x', title='Tipo de Manutenção'))
             st.altair_chart(chart, use_container_width=True)
             
         with cat_col2:
             st.subheader("POR MARCA DO CAMINHÃO")
-            marca_counts = df_filtered.fillna({'marcaequipamento': 'Não Informada'}).groupby('marcaequipamento')['numeroos'].nunique().sort_values(ascending=True).reset_index()
+            marca_counts = df_filtered.fillna({'marcaequipamento': 'Não Informada'}).groupby('marcaequipamento', observed=True)['numeroos'].nunique().sort_values(ascending=True).reset_index()
             marca_counts.columns = ['Marca', 'Quantidade']
             chart = alt.Chart(marca_counts).mark_bar().encode(x=alt.X('Quantidade:Q', title='Quantidade de OS'), y=alt.Y('Marca:N', sort='-x', title='Marca'))
             st.altair_chart(chart, use_container_width=True)
             
         st.subheader("CONTAGEM DE OS POR PLACA")
-        placa_counts = df_filtered.fillna({'placaequipamento': 'Não Informada'}).groupby('placaequipamento')['numeroos'].nunique().sort_values(ascending=False).reset_index()
+        placa_counts = df_filtered.fillna({'placaequipamento': 'Não Informada'}).groupby('placaequipamento', observed=True)['numeroos'].nunique().sort_values(ascending=False).reset_index()
         placa_counts.columns = ['Placa', 'Quantidade']
         chart = alt.Chart(placa_counts).mark_bar().encode(x=alt.X('Placa:N', sort='-y', title='Placa do Equipamento'), y=alt.Y('Quantidade:Q', title='Quantidade de OS'))
         st.altair_chart(chart, use_container_width=True)
@@ -453,30 +695,25 @@ def render_dashboard_page():
                 df_placa_filtrada = df_placa[df_placa['valortotal'] == 0]
 
             os_da_placa = df_placa_filtrada['numeroos'].unique()
-            df_detalhes_placa = df_detalhes[df_detalhes['numeroos'].isin(os_da_placa)]
+            # Índices: detalhes por numeroos (busca binária, uma vez por versão) e OS da placa por numeroos (hash)
+            detalhes_index = get_detalhes_index(fonte, version, df_detalhes)
+            info_por_os = data_processing.indexar_por_os(df_placa_filtrada)
             col_esq, col_dir = st.columns([1, 2])
             with col_esq:
                 st.subheader(f"Placa: {placa_selecionada}")
-                os_abertas, os_executadas, valor_total_servicos, valor_medio, tempo_medio_dias_placa, qtd_motoristas = (
-                    df_placa_filtrada['numeroos'].nunique(),
-                    df_placa_filtrada[df_placa_filtrada['valortotal'] > 0]['numeroos'].nunique(),
-                    df_placa_filtrada['valortotal'].sum(),
-                    df_placa_filtrada[df_placa_filtrada['valortotal'] > 0]['valortotal'].mean() if not df_placa_filtrada[df_placa_filtrada['valortotal'] > 0].empty else 0,
-                    int(((df_placa_filtrada.dropna(subset=['datahorainicio', 'datahorafim'])['datahorafim'] - df_placa_filtrada.dropna(subset=['datahorainicio', 'datahorafim'])['datahorainicio']).dt.total_seconds() / (24 * 3600)).mean()) if not df_placa_filtrada.dropna(subset=['datahorainicio', 'datahorafim']).empty else 0,
-                    df_placa_filtrada['motoristaresponsavel'].nunique()
-                )
-                st.metric("Ordens de Serviço Abertas", os_abertas)
-                st.metric("Ordens de Serviço Executadas", os_executadas)
-                st.metric("Valor Total de Serviços", f"R$ {valor_total_servicos:,.2f}")
-                st.metric("Valor Médio de Manutenções", f"R$ {valor_medio:,.2f}")
-                st.metric("Tempo Médio por OS (dias)", f"{tempo_medio_dias_placa}")
-                st.metric("Quantidade Motoristas", qtd_motoristas)
+                kpi_placa = kpis.calcular_kpis(df_placa_filtrada)
+                st.metric("Ordens de Serviço Abertas", kpi_placa.total_os)
+                st.metric("Ordens de Serviço Executadas", kpi_placa.os_valorizadas)
+                st.metric("Valor Total de Serviços", f"R$ {kpi_placa.custo_total:,.2f}")
+                st.metric("Valor Médio de Manutenções", f"R$ {kpi_placa.custo_medio:,.2f}")
+                st.metric("Tempo Médio por OS (dias)", f"{kpi_placa.tempo_medio_dias}")
+                st.metric("Quantidade Motoristas", kpi_placa.motoristas)
             
             with col_dir:
                 st.subheader("DETALHES DAS ORDENS DE SERVIÇO")
                 for numero_os in sorted(os_da_placa, reverse=True):
-                    grupo_detalhes = df_detalhes_placa[df_detalhes_placa['numeroos'] == numero_os]
-                    info_os = df_placa_filtrada[df_placa_filtrada['numeroos'] == numero_os].iloc[0]
+                    grupo_detalhes = detalhes_index.linhas_os(numero_os)
+                    info_os = info_por_os.loc[numero_os]
                     descricao = info_os['descricaoos']
                     total_os_valor = info_os['valortotal']
                     
@@ -493,15 +730,19 @@ def render_dashboard_page():
                             st.write("Nenhum material registrado para esta OS.")
 
             st.subheader("CUSTOS DE MANUTENÇÃO POR MOTORISTA")
-            custo_por_motorista = df_placa_filtrada.groupby('motoristaresponsavel').agg(valor_total=('valortotal', 'sum'), qtd_os=('numeroos', 'nunique')).reset_index().sort_values(by='valor_total', ascending=False)
+            custo_por_motorista = df_placa_filtrada.groupby('motoristaresponsavel', observed=True).agg(valor_total=('valortotal', 'sum'), qtd_os=('numeroos', 'nunique')).reset_index().sort_values(by='valor_total', ascending=False)
             custo_por_motorista.columns = ['Motorista', 'Valor Total de Serviços', 'Qtd. OS Abertas']
             st.dataframe(custo_por_motorista, hide_index=True, use_container_width=True, column_config={"Valor Total de Serviços": st.column_config.NumberColumn(format="R$ %.2f")})
         
         st.divider()
         st.header("ORDENS DE SERVIÇO POR MOTORISTA E PLACA")
         
-        # Preparar dados para tabela detalhada
-        df_motorista_detalhado = df_filtered.fillna({
+        # Preparar dados para tabela detalhada (só as colunas exibidas; ordenado por abertura uma única vez)
+        df_motorista_detalhado = df_filtered[[
+            'placaequipamento', 'marcaequipamento', 'datahoraos', 'datahorainicio', 'datahorafim',
+            'titulomanutencao', 'motoristaresponsavel', 'mecanicoresponsavel',
+            'tipomanutencao', 'numeroos', 'descricaoos'
+        ]].fillna({
             'motoristaresponsavel': 'Não Informado', 
             'placaequipamento': 'Não Informada',
             'marcaequipamento': 'Não Informada',
@@ -509,24 +750,35 @@ def render_dashboard_page():
             'mecanicoresponsavel': 'Não Informado',
             'tipomanutencao': 'Não Informado',
             'descricaoos': 'Sem descrição'
-        }).copy()
+        }).sort_values(by='datahoraos', ascending=False, kind='stable')
+        
+        # Um único groupby: total de OS e posições das linhas de cada motorista
+        # (observed=True: categorias sem linhas, como o rótulo de vazio, não viram motoristas)
+        grupos_motorista = df_motorista_detalhado.groupby('motoristaresponsavel', sort=True, observed=True)
+        driver_total_os = grupos_motorista['numeroos'].nunique()
+        driver_posicoes = grupos_motorista.indices
         
-        # Calcular totais por motorista
-        driver_total_os = df_motorista_detalhado.groupby('motoristaresponsavel')['numeroos'].nunique().to_dict()
+        # Paginação: só os motoristas da página atual são materializados e enviados ao navegador
+        motoristas_ordenados = list(driver_total_os.index)
+        total_paginas = max(1, math.ceil(len(motoristas_ordenados) / MOTORISTAS_POR_PAGINA))
+        pagina = 1
+        if total_paginas > 1:
+            # Valor inicial só pela chave (sem value=), como na tabela de OS
+            st.session_state.setdefault('pagina_motoristas', 1)
+            if st.session_state.pagina_motoristas > total_paginas:
+                st.session_state.pagina_motoristas = total_paginas
+            pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, key="pagina_motoristas")
+        inicio = (pagina - 1) * MOTORISTAS_POR_PAGINA
+        motoristas_pagina = motoristas_ordenados[inicio:inicio + MOTORISTAS_POR_PAGINA]
+        if total_paginas > 1:
+            st.caption(f"Motoristas {inicio + 1} a {inicio + len(motoristas_pagina)} de {len(motoristas_ordenados)}")
         
-        for driver in sorted(driver_total_os.keys()):
-            total_os_for_driver = driver_total_os.get(driver, 0)
+        for driver in motoristas_pagina:
+            total_os_for_driver = driver_total_os[driver]
             
             with st.expander(f"Motorista: {driver} ({total_os_for_driver} OS no total)"):
-                # Filtrar dados do motorista
-                driver_data = df_motorista_detalhado[df_motorista_detalhado['motoristaresponsavel'] == driver].copy()
-                
                 # Preparar tabela detalhada igual à página de OS em Andamento
-                df_display_motorista = driver_data[[
-                    'placaequipamento', 'marcaequipamento', 'datahoraos', 'datahorainicio', 'datahorafim',
-                    'titulomanutencao', 'motoristaresponsavel', 'mecanicoresponsavel',
-                    'tipomanutencao', 'numeroos', 'descricaoos'
-                ]].rename(columns={
+                df_display_motorista = df_motorista_detalhado.iloc[driver_posicoes[driver]].rename(columns={
                     'placaequipamento': 'PLACA',
                     'marcaequipamento': 'MARCA',
                     'datahoraos': 'DATA ABERTURA',
@@ -538,7 +790,7 @@ def render_dashboard_page():
                     'tipomanutencao': 'TIPO MANUT.',
                     'numeroos': 'OS',
                     'descricaoos': 'DESCRIÇÃO'
-                }).sort_values(by='DATA ABERTURA', ascending=False)
+                })
                 
                 # Exibir tabela detalhada
                 st.dataframe(
@@ -560,76 +812,149 @@ def render_dashboard_page():
         # NOVA TABELA GERAL NO FINAL
         st.divider()
         st.header("TABELA GERAL DE ORDENS DE SERVIÇO")
-        
-        # Preparar dados com tempo em dias
-        df_tabela_geral = df_filtered.fillna({
-            'placaequipamento': 'Não Informada',
-            'marcaequipamento': 'Não Informada',
-            'titulomanutencao': 'Não Informado',
-            'motoristaresponsavel': 'Não Informado',
-            'mecanicoresponsavel': 'Não Informado',
-            'tipomanutencao': 'Não Informado',
-            'descricaoos': 'Sem descrição'
-        }).copy()
-        
-        # Calcular tempo em dias
-        today = pd.to_datetime('today').normalize()
-        df_tabela_geral['TEMPO (D)'] = (today - df_tabela_geral['datahoraos']).dt.days
-        df_tabela_geral['TEMPO (D)'] = df_tabela_geral['TEMPO (D)'].apply(lambda x: max(x, 0))
-        
-        # Preparar tabela igual à OS em Andamento
-        df_display_geral = df_tabela_geral[[
-            'placaequipamento', 'marcaequipamento', 'datahoraos',
-            'titulomanutencao', 'motoristaresponsavel', 'mecanicoresponsavel',
-            'tipomanutencao', 'numeroos', 'TEMPO (D)', 'datahorainicio', 'datahorafim', 'descricaoos'
-        ]].rename(columns={
-            'placaequipamento': 'PLACA',
-            'marcaequipamento': 'MARCA',
-            'datahoraos': 'DATA ABERTURA',
-            'titulomanutencao': 'TÍTULO MANUTENÇÃO',
-            'motoristaresponsavel': 'MOTORISTA',
-            'mecanicoresponsavel': 'MECÂNICO',
-            'tipomanutencao': 'TIPO MANUT.',
-            'numeroos': 'OS',
-            'datahorainicio': 'DATA INÍCIO',
-            'datahorafim': 'DATA FIM',
-            'descricaoos': 'DESCRIÇÃO'
-        }).sort_values(by='DATA ABERTURA', ascending=False)
-        
-        st.info(f"Mostrando {len(df_display_geral)} registros filtrados")
-        
-        # Exibir tabela geral
-        st.dataframe(
-            df_display_geral, 
-            use_container_width=True, 
-            hide_index=True,
-            column_config={
-                "DATA ABERTURA": st.column_config.DatetimeColumn(
-                    "DATA ABERTURA",
-                    format="DD/MM/YYYY HH:mm"
-                ),
-                "DATA INÍCIO": st.column_config.DatetimeColumn(
-                    "DATA INÍCIO",
-                    format="DD/MM/YYYY HH:mm"
-                ),
-                "DATA FIM": st.column_config.DatetimeColumn(
-                    "DATA FIM",
-                    format="DD/MM/YYYY HH:mm"
-                ),
-                "TEMPO (D)": st.column_config.NumberColumn(
-                    "TEMPO (D)",
-                    format="%d"
-                ),
-                "DESCRIÇÃO": st.column_config.TextColumn(
-                    "DESCRIÇÃO",
-                    width=400
-                )
-            }
-        )
+        render_tabela_geral(df_filtered)
 
     except Exception as e:
         st.error(f"Ocorreu um erro ao processar os dados da API: {e}")
 
+# Tabela geral: (coluna de ordenação, inverte a direção). TEMPO (D) cresce quando a data de abertura diminui.
+TABELA_ORDENACAO = {
+    'DATA ABERTURA': ('datahoraos', False),
+    'TEMPO (D)': ('datahoraos', True),
+    'OS': ('numeroos', False),
+    'PLACA': ('placaequipamento', False),
+    'MOTORISTA': ('motoristaresponsavel', False),
+    'MECÂNICO': ('mecanicoresponsavel', False),
+    'TÍTULO MANUTENÇÃO': ('titulomanutencao', False),
+    'DATA FIM': ('datahorafim', False),
+}
+TABELA_BUSCA_COLUNAS = [
+    'placaequipamento', 'marcaequipamento', 'titulomanutencao', 'motoristaresponsavel',
+    'mecanicoresponsavel', 'tipomanutencao', 'descricaoos',
+]
+
+
+def render_tabela_geral(df_filtered):
+    """
+    Tabela geral paginada no servidor: busca e ordenação rodam sobre o DataFrame filtrado,
+    mas só as linhas da página são formatadas e enviadas ao navegador.
+    """
+    col_busca, col_ordem, col_direcao, col_linhas = st.columns([3, 2, 1, 1])
+    with col_busca:
+        termo = st.text_input("Pesquisar (placa, motorista, título, descrição ou nº da OS)", key="tabela_busca").strip()
+    with col_ordem:
+        ordenar_por = st.selectbox("Ordenar por", list(TABELA_ORDENACAO), key="tabela_ordem")
+    with col_direcao:
+        decrescente = st.toggle("Decrescente", value=True, key="tabela_decrescente")
+    with col_linhas:
+        linhas_por_pagina = st.selectbox("Linhas por página", TABELA_LINHAS_POR_PAGINA, key="tabela_linhas")
+
+    df_busca = df_filtered
+    if termo:
+        mask = data_processing.mascara_busca(df_filtered, TABELA_BUSCA_COLUNAS, termo)
+        if termo.isdigit():
+            mask |= df_filtered['numeroos'].astype(str).str.contains(termo, regex=False).to_numpy(dtype=bool)
+        df_busca = df_filtered[mask]
+
+    total = len(df_busca)
+    if total == 0:
+        st.info("Nenhuma OS encontrada para a busca e os filtros selecionados.")
+        return
+
+    total_paginas = max(1, math.ceil(total / linhas_por_pagina))
+    pagina = 1
+    if total_paginas > 1:
+        # Valor inicial só pela chave (sem value=): o widget não recebe valor padrão e Session State ao mesmo tempo
+        st.session_state.setdefault('tabela_pagina', 1)
+        if st.session_state.tabela_pagina > total_paginas:
+            st.session_state.tabela_pagina = total_paginas
+        pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, key="tabela_pagina")
+    inicio = (pagina - 1) * linhas_por_pagina
+    fim = min(inicio + linhas_por_pagina, total)
+
+    coluna, inverte = TABELA_ORDENACAO[ordenar_por]
+    posicoes = data_processing.posicoes_pagina(df_busca[coluna], inicio, fim, crescente=decrescente == inverte)
+
+    # Daqui em diante só as linhas da página
+    df_pagina = df_busca.iloc[posicoes].fillna({
+        'placaequipamento': 'Não Informada',
+        'marcaequipamento': 'Não Informada',
+        'titulomanutencao': 'Não Informado',
+        'motoristaresponsavel': 'Não Informado',
+        'mecanicoresponsavel': 'Não Informado',
+        'tipomanutencao': 'Não Informado',
+        'descricaoos': 'Sem descrição'
+    })
+    descricoes = df_pagina['descricaoos'].astype(str)
+
+    today = pd.to_datetime('today').normalize()
+    df_display_geral = pd.DataFrame({
+        'PLACA': df_pagina['placaequipamento'],
+        'MARCA': df_pagina['marcaequipamento'],
+        'DATA ABERTURA': df_pagina['datahoraos'],
+        'TÍTULO MANUTENÇÃO': df_pagina['titulomanutencao'],
+        'MOTORISTA': df_pagina['motoristaresponsavel'],
+        'MECÂNICO': df_pagina['mecanicoresponsavel'],
+        'TIPO MANUT.': df_pagina['tipomanutencao'],
+        'OS': df_pagina['numeroos'],
+        'TEMPO (D)': (today - df_pagina['datahoraos']).dt.days.clip(lower=0),
+        'DATA INÍCIO': df_pagina['datahorainicio'],
+        'DATA FIM': df_pagina['datahorafim'],
+        'DESCRIÇÃO': descricoes.where(
+            descricoes.str.len() <= DESCRICAO_MAX_CARACTERES,
+            descricoes.str.slice(0, DESCRICAO_MAX_CARACTERES).str.rstrip() + '…'
+        ),
+    })
+
+    # Categorias viram texto: o dicionário completo de categorias não vai junto com a página
+    colunas_categoricas = df_display_geral.select_dtypes('category').columns
+    df_display_geral = df_display_geral.astype({c: str for c in colunas_categoricas})
+
+    resumo = f"Mostrando {inicio + 1} a {fim} de {total} registros"
+    if termo:
+        resumo += f" encontrados para \"{termo}\" ({len(df_filtered)} filtrados)"
+    else:
+        resumo += " filtrados"
+    st.info(resumo)
+
+    # Exibir tabela geral
+    st.dataframe(
+        df_display_geral,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "DATA ABERTURA": st.column_config.DatetimeColumn(
+                "DATA ABERTURA",
+                format="DD/MM/YYYY HH:mm"
+            ),
+            "DATA INÍCIO": st.column_config.DatetimeColumn(
+                "DATA INÍCIO",
+                format="DD/MM/YYYY HH:mm"
+            ),
+            "DATA FIM": st.column_config.DatetimeColumn(
+                "DATA FIM",
+                format="DD/MM/YYYY HH:mm"
+            ),
+            "TEMPO (D)": st.column_config.NumberColumn(
+                "TEMPO (D)",
+                format="%d"
+            ),
+            "DESCRIÇÃO": st.column_config.TextColumn(
+                "DESCRIÇÃO",
+                width=400
+            )
+        }
+    )
+
+    # Descrição completa sob demanda (só das OS truncadas desta página)
+    truncadas = descricoes.str.len() > DESCRICAO_MAX_CARACTERES
+    if truncadas.any():
+        with st.expander("Ver descrição completa"):
+            os_truncadas = df_pagina.loc[truncadas, 'numeroos'].tolist()
+            os_escolhida = st.selectbox("OS", os_truncadas, key="tabela_descricao_os")
+            st.text(descricoes[df_pagina['numeroos'] == os_escolhida].iloc[0])
+
+
 # PÁGINA OS EM ANDAMENTO OTIMIZADA
 def render_andamento_page():
     col1, col2 = st.columns([4, 1])
@@ -648,70 +973,73 @@ def render_andamento_page():
             log_placeholder = st.empty()
             with st.spinner("Atualizando histórico..."):
                 # USA A NOVA FUNÇÃO QUE SÓ BUSCA HISTÓRICO
-                success = fetch_historico_only(st.session_state.config, log_callback=log_placeholder.info)
-                if success:
-                    st.cache_data.clear()
+                config = st.session_state.config
+                success = get_refresh_service().run(
+                    log_placeholder.info, refresh=lambda log_callback: fetch_historico_only(config, log_callback))
+                if success is None:
+                    log_placeholder.info("Já existe uma atualização em andamento. Os dados aparecem assim que ela terminar.")
+                elif success:
                     log_placeholder.empty()
                     st.success("Histórico atualizado com sucesso!")
                     st.rerun()
 
     # Verifica se há dados carregados
-    if not st.session_state.api_data:
+    if not get_store().has_historico:
         st.warning("Nenhum dado carregado. Clique em 'Atualizar Dados' para buscar informações da API.")
         return
 
     try:
-        # USA A NOVA FUNÇÃO QUE SÓ CARREGA HISTÓRICO
-        df = load_historico_only()
+        # Só as OS em andamento (índice mantido pela sincronização), não o histórico inteiro
+        version = get_store().version
+        df = load_andamento(version)
         if df is None:
             st.error("Erro ao processar os dados da API.")
             return
-            
-        # Adiciona situação das OS (sem usar valortotal dos detalhes)
-        df['Situação da OS'] = df.apply(classify_os_status, axis=1)
 
-        # FILTROS NA SIDEBAR (IGUAIS AO DASHBOARD)
+        # FILTROS NA SIDEBAR (IGUAIS AO DASHBOARD, COM AS OPÇÕES DAS OS EM ANDAMENTO)
         st.sidebar.header("Filtros")
         
         col1_sidebar_and, col2_sidebar_and = st.sidebar.columns(2)
         with col2_sidebar_and:
             if st.button("Limpar Filtros", key="limpar_filtros_andamento"):
-                keys_to_keep = ['config', 'scheduler_running', 'scheduler_thread', 'last_update', 'update_log', 'next_update_time', 'api_data', 'api_details']
+                keys_to_keep = ['config']
                 for key in list(st.session_state.keys()):
                     if key not in keys_to_keep: del st.session_state[key]
                 st.rerun()
         
-        anos = ['Todos'] + sorted(df['datahoraos'].dt.year.dropna().unique().astype(int), reverse=True)
+        opcoes = get_opcoes_filtros('andamento', version, df)
+        anos = ['Todos'] + opcoes['anos']
         anos_selecionados = st.sidebar.multiselect('Período (Ano)', anos, default=['Todos'], key="anos_andamento")
         
         # FILTRO DE MÊS EM PORTUGUÊS (MULTISELECT)
-        meses_disponveis = sorted(df['datahoraos'].dt.month.dropna().unique().astype(int))
-        meses_opcoes = ['Todos'] + [MONTHS_PT[mes] for mes in meses_disponveis]
+        meses_opcoes = ['Todos'] + [MONTHS_PT[mes] for mes in opcoes['meses']]
         meses_selecionados = st.sidebar.multiselect('Mês', meses_opcoes, default=['Todos'], key="meses_andamento")
         
-        os_list = sorted(df['numeroos'].dropna().unique().astype(int))
-        os_selecionadas = st.sidebar.multiselect('Pesquisar OS', os_list, key="os_andamento")
-        marcas = sorted(df['marcaequipamento'].dropna().unique())
-        marca_selecionada = st.sidebar.multiselect('Marca', marcas, key="marca_andamento")
-        placas = sorted(df['placaequipamento'].dropna().unique())
-        placa_selecionada_filtro = st.sidebar.multiselect('Placa', placas, key="placa_andamento")
-        tipos_manutencao = sorted(df['titulomanutencao'].dropna().unique())
-        tipo_manutencao_selecionado = st.sidebar.multiselect('Tipo Manutenção', tipos_manutencao, key="tipo_andamento")
-        situacoes = sorted(df['Situação da OS'].dropna().unique())
-        situacao_selecionada = st.sidebar.multiselect('Situação', situacoes, key="situacao_andamento")
-        motoristas = sorted(df['motoristaresponsavel'].dropna().unique())
-        motorista_selecionado = st.sidebar.multiselect('Motorista', motoristas, key="motorista_andamento")
+        os_selecionadas = _filtro_os(opcoes['numeroos'], key="os_andamento")
+        marca_selecionada = st.sidebar.multiselect('Marca', opcoes['marcaequipamento'], key="marca_andamento")
+        placa_selecionada_filtro = st.sidebar.multiselect('Placa', opcoes['placaequipamento'], key="placa_andamento")
+        tipo_manutencao_selecionado = st.sidebar.multiselect('Tipo Manutenção', opcoes['titulomanutencao'], key="tipo_andamento")
+        situacao_selecionada = st.sidebar.multiselect('Situação', opcoes['Situação da OS'], key="situacao_andamento")
+        motorista_selecionado = st.sidebar.multiselect('Motorista', opcoes['motoristaresponsavel'], key="motorista_andamento")
 
-        # APLICAR FILTROS
-        df_filtered = apply_filters(df, anos_selecionados, meses_selecionados, os_selecionadas, 
-                                  marca_selecionada, placa_selecionada_filtro, tipo_manutencao_selecionado, 
-                                  situacao_selecionada, motorista_selecionado)
+        # Tabela num fragmento: a cada interval_andamento minutos só ela é refeita, com a versão mais recente
+        tabela = st.fragment(render_andamento_tabela,
+                             run_every=st.session_state.config.get('interval_andamento', 5) * 60)
+        tabela(anos_selecionados, meses_selecionados, os_selecionadas, marca_selecionada,
+               placa_selecionada_filtro, tipo_manutencao_selecionado, situacao_selecionada, motorista_selecionado)
+    except Exception as e:
+        st.error(f"Ocorreu um erro ao processar os dados: {e}")
 
-        # Filtrar apenas OS em andamento
-        df_andamento = df_filtered[df_filtered['datahorainicio'].notna() & df_filtered['datahorafim'].isna()].copy()
+def render_andamento_tabela(*filtros):
+    """Total e tabela das OS em andamento para os filtros da sidebar (mesma ordem de argumentos de apply_filters)."""
+    try:
+        version = get_store().version
+        df = load_andamento(version)
+        if df is None:
+            return
+        df_andamento = apply_filters(df, *filtros, filter_index=get_filter_index('andamento', version, df))
         today = pd.to_datetime('today').normalize()
-        df_andamento['TEMPO (D)'] = (today - df_andamento['datahoraos']).dt.days
-        df_andamento['TEMPO (D)'] = df_andamento['TEMPO (D)'].apply(lambda x: max(x, 0))
+        df_andamento = df_andamento.assign(**{'TEMPO (D)': (today - df_andamento['datahoraos']).dt.days.clip(lower=0)})
 
         st.metric("Total de OS em Andamento", len(df_andamento))
 
@@ -811,48 +1139,79 @@ def render_settings_page():
         save_config()
 
     st.subheader("Controle do Agendador")
+    render_scheduler_status()
+
+    st.subheader("Última Sincronização de Detalhes")
+    relatorio = get_store().sync_report
+    if relatorio:
+        col1_sync, col2_sync, col3_sync, col4_sync = st.columns(4)
+        col1_sync.metric("OS no histórico", relatorio["total_os"])
+        col2_sync.metric("Detalhes consultados", relatorio["consultadas"],
+                         help=f"{relatorio['novas']} novas, {relatorio['alteradas']} alteradas, "
+                              f"{relatorio['nao_finalizadas']} não finalizadas; {relatorio['falhas']} falhas")
+        col3_sync.metric("Consultas evitadas", relatorio["chamadas_evitadas"],
+                         help="OS finalizadas cujo lastupdate não mudou desde a última busca de detalhes")
+        col4_sync.metric("Lidos do banco", relatorio["lidas_do_banco"])
+        st.caption(f"Sincronização de {relatorio['horario']}")
+    else:
+        st.info("Nenhuma sincronização de detalhes neste processo ainda.")
+
+    st.subheader("Memória dos Dados em Cache")
+    relatorios = get_memory_reports()
+    if relatorios:
+        for fonte, relatorio in relatorios.items():
+            total = relatorio.loc["TOTAL"]
+            with st.expander(f"{fonte}: {total['antes (MB)']:.1f} MB → {total['depois (MB)']:.1f} MB"):
+                st.dataframe(relatorio, use_container_width=True)
+    else:
+        st.info("Nenhum conjunto de dados carregado neste processo ainda.")
+
+    st.subheader("Latência da API")
+    latencias = api_client.latency_stats()
+    if latencias:
+        st.dataframe(pd.DataFrame(latencias), hide_index=True, use_container_width=True)
+    else:
+        st.info("Nenhuma chamada à API registrada neste processo ainda.")
+
+@st.fragment(run_every=SCHEDULER_STATUS_REFRESH_SECONDS)
+def render_scheduler_status():
+    """
+    Controles e status do agendador num fragmento: só esta parte é re-executada a cada segundo,
+    sem rodar de novo o script inteiro (config, navegação, logo) para cada aba aberta.
+    """
+    service = get_refresh_service()
     col1_config, col2_config = st.columns(2)
     with col1_config:
-        if st.button("Iniciar Agendador", disabled=st.session_state.scheduler_running):
+        if st.button("Iniciar Agendador", disabled=service.running):
             if not all([st.session_state.config['login'], st.session_state.config['password']]):
                 st.error("Configure login e senha no config.json antes de iniciar.")
             else:
-                st.session_state.scheduler_running = True
-                thread = threading.Thread(target=scheduler_loop)
-                add_script_run_ctx(thread)
-                thread.start()
-                st.session_state.scheduler_thread = thread
-                st.success("Agendador iniciado!")
+                service.start()
                 st.rerun()
     with col2_config:
-        if st.button("Parar Agendador", disabled=not st.session_state.scheduler_running):
-            st.session_state.scheduler_running = False
-            if st.session_state.scheduler_thread:
-                st.session_state.scheduler_thread.join(timeout=2)
-            st.warning("Agendador parado.")
+        if st.button("Parar Agendador", disabled=not service.running):
+            service.stop()
             st.rerun()
             
-    status_color = "green" if st.session_state.scheduler_running else "red"
-    st.markdown(f"**Status do Agendador:** <span style='color:{status_color};'>{'Ativo' if st.session_state.scheduler_running else 'Parado'}</span>", unsafe_allow_html=True)
-    st.info("ℹ️ O agendador utiliza o intervalo do Dashboard para atualizações automáticas")
+    status_color = "green" if service.running else "red"
+    st.markdown(f"**Status do Agendador:** <span style='color:{status_color};'>{'Ativo' if service.running else 'Parado'}</span>", unsafe_allow_html=True)
+    st.info("ℹ️ O agendador é único para todo o servidor, continua ativo sem nenhuma página aberta e utiliza o intervalo do Dashboard salvo no config.json")
     
-    countdown_placeholder = st.empty()
-    if st.session_state.scheduler_running:
-        if st.session_state.get('next_update_time'):
-            remaining_seconds = st.session_state.next_update_time - time.time()
+    if service.running:
+        if service.refreshing:
+            st.info("Atualização em andamento...")
+        elif service.next_run:
+            remaining_seconds = service.next_run - time.time()
             if remaining_seconds > 0:
                 mins, secs = divmod(int(remaining_seconds), 60)
-                countdown_placeholder.info(f"Próxima atualização em: {mins:02d}:{secs:02d}")
+                st.info(f"Próxima atualização em: {mins:02d}:{secs:02d}")
             else:
-                countdown_placeholder.info("Aguardando início da próxima atualização...")
+                st.info("Aguardando início da próxima atualização...")
         else:
-            countdown_placeholder.info("Iniciando a primeira atualização...")
-        
-        time.sleep(1)
-        st.rerun()
+            st.info("Iniciando a primeira atualização...")
         
-    st.info(f"Última atualização automática: {st.session_state.last_update}")
-    st.code(st.session_state.update_log, language=None)
+    st.info(f"Última atualização automática: {service.last_run or 'Nenhuma atualização automática ainda.'}")
+    st.code(service.log, language=None)
 
 # --- Ponto de Entrada Principal ---
 def main():
@@ -0,0 +1,439 @@
+"""
+Processamento vetorizado dos DataFrames do dashboard.
+- Classificação da situação da OS (numpy.select sobre máscaras booleanas).
+- Índice de filtros: ano/mês e códigos das colunas filtráveis calculados uma vez por versão.
+- Índice de detalhes por numeroos (ordenado, busca binária) e índice de OS por numeroos (hash).
+- Esquema de tipos do DataFrame de OS (categorias, inteiros/floats menores) com relatório de memória.
+- Paginação no servidor: busca textual e ordenação parcial que devolvem só as posições da página.
+- Tabela fato mensal do gráfico REGISTRO DE OS (contagens por mês e colunas filtráveis).
+- Opções dos filtros da sidebar por versão e busca de números de OS por prefixo.
+Funções puras, sem dependência do Streamlit: podem ser usadas nos loaders cacheados por versão.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Ordem = precedência das regras de classificação
+SITUACOES_OS = [
+    "VALORIZADO E FINALIZADO",
+    "ANDAMENTO",
+    "EXECUTADO",
+    "FINALIZADA",
+    "EM BRANCO",
+    "OUTRO",
+]
+
+
+def classify_os_status(df: pd.DataFrame) -> pd.Series:
+    """
+    Classifica a situação de cada OS, retornando uma coluna Categorical.
+    Regras, na ordem de precedência:
+    - VALORIZADO E FINALIZADO: valortotal > 0, datahorafim preenchida e status FINALIZADA
+    - ANDAMENTO: datahorainicio preenchida e datahorafim vazia
+    - EXECUTADO: valortotal > 0 e datahorafim vazia
+    - FINALIZADA: datahorafim preenchida e status FINALIZADA
+    - EM BRANCO: datahorainicio e datahorafim vazias
+    - OUTRO: demais casos
+    Sem a coluna valortotal (ex.: só histórico), nenhuma OS é considerada valorizada.
+    """
+    if "valortotal" in df.columns:
+        is_valorizado = df["valortotal"].gt(0).to_numpy()
+    else:
+        is_valorizado = np.zeros(len(df), dtype=bool)
+    tem_inicio = df["datahorainicio"].notna().to_numpy()
+    tem_fim = df["datahorafim"].notna().to_numpy()
+    status_finalizada = (df["status"].fillna("").astype(str).str.strip().str.upper() == "FINALIZADA").to_numpy()
+    is_finalizada = tem_fim & status_finalizada
+
+    situacao = np.select(
+        [
+            is_valorizado & is_finalizada,
+            tem_inicio & ~tem_fim,
+            is_valorizado & ~tem_fim,
+            is_finalizada,
+            ~tem_inicio & ~tem_fim,
+        ],
+        SITUACOES_OS[:-1],
+        default=SITUACOES_OS[-1],
+    )
+    return pd.Series(pd.Categorical(situacao, categories=SITUACOES_OS), index=df.index)
+
+
+# Colunas filtradas por valor exato na sidebar
+FILTER_COLUMNS = [
+    "marcaequipamento",
+    "placaequipamento",
+    "titulomanutencao",
+    "Situação da OS",
+    "motoristaresponsavel",
+]
+
+
+def _mascara_codigos(codes: np.ndarray, categorias: pd.Index, valores: Iterable) -> np.ndarray:
+    """Máscara dos códigos cujo valor está em `valores` (tabela de consulta indexada pelo código)."""
+    alvo = categorias.get_indexer(list(valores))
+    # Posição extra no fim: código -1 (valor vazio) nunca é selecionado
+    tabela = np.zeros(len(categorias) + 1, dtype=bool)
+    tabela[alvo[alvo >= 0]] = True
+    return tabela[codes]
+
+
+class FilterIndex:
+    """
+    Pré-processamento dos filtros de um DataFrame (uma vez por versão dos dados):
+    ano/mês de abertura como inteiros e códigos inteiros (pd.factorize) das colunas filtráveis.
+    `select` combina todos os filtros numa única máscara e devolve as posições das linhas.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        datas = df["datahoraos"]
+        # NaT vira 0: nunca coincide com um ano/mês selecionado
+        self.ano = datas.dt.year.fillna(0).astype("int16").to_numpy()
+        self.mes = datas.dt.month.fillna(0).astype("int8").to_numpy()
+        self.numeroos = df["numeroos"].to_numpy()
+        self.codes = {}
+        self.categorias = {}
+        for coluna in FILTER_COLUMNS:
+            if coluna not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[coluna])
+            self.codes[coluna] = codes
+            self.categorias[coluna] = pd.Index(np.asarray(uniques, dtype=object))
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """Indica se o índice foi construído para este DataFrame (mesmas OS na mesma ordem)."""
+        return self.size == len(df) and np.array_equal(self.numeroos, df["numeroos"].to_numpy())
+
+    def _mask_valores(self, coluna: str, valores: Iterable) -> np.ndarray:
+        """Máscara das linhas cujo valor em `coluna` está em `valores` (via tabela de códigos)."""
+        return _mascara_codigos(self.codes[coluna], self.categorias[coluna], valores)
+
+    def select(self, anos: Optional[Iterable[int]] = None, meses: Optional[Iterable[int]] = None,
+               numeros_os: Optional[Iterable[int]] = None,
+               valores: Optional[Dict[str, Iterable]] = None) -> Optional[np.ndarray]:
+        """
+        Retorna as posições das linhas que atendem a todos os filtros informados,
+        ou None se nenhum filtro estiver ativo (todas as linhas).
+        `valores` mapeia colunas de FILTER_COLUMNS para os valores selecionados.
+        """
+        mask = None
+        parciais = []
+        if anos:
+            parciais.append(np.isin(self.ano, list(anos)))
+        if meses:
+            parciais.append(np.isin(self.mes, list(meses)))
+        if numeros_os:
+            parciais.append(np.isin(self.numeroos, list(numeros_os)))
+        for coluna, selecionados in (valores or {}).items():
+            if selecionados and coluna in self.codes:
+                parciais.append(self._mask_valores(coluna, selecionados))
+        for parcial in parciais:
+            mask = parcial if mask is None else (mask & parcial)
+        return None if mask is None else np.flatnonzero(mask)
+
+
+class DetalhesIndex:
+    """
+    Linhas de material (df_detalhes) ordenadas por numeroos uma vez por versão dos dados.
+    A busca das linhas de uma OS é binária (searchsorted) e devolve uma fatia, sem varrer o DataFrame.
+    """
+
+    def __init__(self, df_detalhes: pd.DataFrame):
+        # Ordenação estável: mantém a ordem original dos itens dentro de cada OS
+        self.detalhes = df_detalhes.sort_values("numeroos", kind="stable").reset_index(drop=True)
+        self._numeros = self.detalhes["numeroos"].to_numpy()
+
+    def linhas_os(self, numeroos) -> pd.DataFrame:
+        """Linhas de material de uma OS."""
+        inicio = np.searchsorted(self._numeros, numeroos, side="left")
+        fim = np.searchsorted(self._numeros, numeroos, side="right")
+        return self.detalhes.iloc[inicio:fim]
+
+
+def indexar_por_os(df: pd.DataFrame) -> pd.DataFrame:
+    """Primeira linha de cada OS indexada por numeroos (busca por hash com .loc)."""
+    return df.drop_duplicates("numeroos").set_index("numeroos", drop=False)
+
+
+# Esquema de tipos do DataFrame de OS: coluna -> (tipo, rótulo usado pelas páginas para valores vazios).
+# O rótulo entra nas categorias para que fillna(rótulo) continue funcionando sobre a coluna categórica.
+OS_SCHEMA = {
+    "numeroos": ("int32", None),
+    "placaequipamento": ("category", "Não Informada"),
+    "marcaequipamento": ("category", "Não Informada"),
+    "modeloequipamento": ("category", None),
+    "hodometro": ("float32", None),
+    "titulomanutencao": ("category", "Não Informado"),
+    "tipomanutencao": ("category", "Não Informado"),
+    "status": ("category", ""),
+    "motoristaresponsavel": ("category", "Não Informado"),
+    "mecanicoresponsavel": ("category", "Não Informado"),
+    "fornecedor": ("category", None),
+}
+
+
+def otimizar_tipos(df: pd.DataFrame, schema: Dict[str, tuple] = OS_SCHEMA) -> pd.DataFrame:
+    """
+    Converte as colunas do esquema: textos repetitivos em Categorical, inteiros e floats para tipos menores.
+    Inteiros que não cabem no tipo (ou com vazios) ficam como estão. Retorna um novo DataFrame.
+    """
+    df = df.copy(deep=False)
+    for coluna, (tipo, rotulo) in schema.items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if tipo == "category":
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                serie = serie.astype("category")
+            if rotulo is not None and rotulo not in serie.cat.categories:
+                # Mantém as categorias em ordem alfabética: groupby/sort_values seguem a mesma ordem dos textos
+                serie = serie.cat.set_categories(sorted([*serie.cat.categories, rotulo]))
+        elif tipo.startswith("int"):
+            numeros = pd.to_numeric(serie, errors="coerce")
+            limites = np.iinfo(tipo)
+            if numeros.isna().any() or (len(numeros) and (numeros.min() < limites.min or numeros.max() > limites.max)):
+                continue
+            serie = numeros.astype(tipo)
+        else:
+            serie = pd.to_numeric(serie, errors="coerce").astype(tipo)
+        df[coluna] = serie
+    return df
+
+
+def relatorio_memoria(antes: pd.DataFrame, depois: pd.DataFrame) -> pd.DataFrame:
+    """Memória por coluna (memory_usage(deep=True), em MB) antes e depois da otimização, com linha TOTAL."""
+    mb_antes = antes.memory_usage(deep=True, index=False) / 1e6
+    mb_depois = depois.memory_usage(deep=True, index=False).reindex(mb_antes.index) / 1e6
+    relatorio = pd.DataFrame({
+        "tipo": depois.dtypes.reindex(mb_antes.index).astype(str),
+        "antes (MB)": mb_antes,
+        "depois (MB)": mb_depois,
+    })
+    relatorio.loc["TOTAL"] = ["", mb_antes.sum(), mb_depois.sum()]
+    relatorio["redução"] = (1 - relatorio["depois (MB)"] / relatorio["antes (MB)"].where(relatorio["antes (MB)"] > 0)).fillna(0)
+    return relatorio.round({"antes (MB)": 2, "depois (MB)": 2, "redução": 3})
+
+
+def mascara_busca(df: pd.DataFrame, colunas: Iterable[str], termo: str) -> np.ndarray:
+    """
+    Linhas em que `termo` aparece (sem diferenciar maiúsculas) em alguma das colunas.
+    Em colunas categóricas a busca roda só nas categorias e é mapeada pelos códigos.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    for coluna in colunas:
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            categorias = pd.Series(serie.cat.categories).astype(str)
+            tabela = np.append(categorias.str.contains(termo, case=False, regex=False).to_numpy(dtype=bool), False)
+            mask |= tabela[serie.cat.codes.to_numpy()]
+        else:
+            mask |= serie.astype(str).str.contains(termo, case=False, regex=False).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _chave_ordenacao(serie: pd.Series) -> tuple:
+    """Chave numérica de ordenação da coluna e máscara de vazios (categorias já estão em ordem alfabética)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codes = serie.cat.codes.to_numpy()
+        return codes, codes < 0
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype) or pd.api.types.is_numeric_dtype(serie.dtype):
+        vazios = serie.isna().to_numpy()
+        valores = serie.to_numpy()
+        if valores.dtype.kind == "M":
+            valores = valores.view("i8")
+        return valores, vazios
+    codes, _ = pd.factorize(serie, sort=True)
+    return codes, codes < 0
+
+
+def posicoes_pagina(serie: pd.Series, inicio: int, fim: int, crescente: bool = True) -> np.ndarray:
+    """
+    Posições das linhas [inicio, fim) da ordenação de `serie` (vazios sempre por último),
+    sem ordenar tudo: o valor de corte das `fim` primeiras vem de np.partition e só as linhas
+    até o corte são ordenadas. Empates ficam na ordem das linhas (como sort_values(kind="stable"),
+    nos dois sentidos), então a ordem é total e as páginas não repetem nem perdem linhas.
+    """
+    chave, vazios = _chave_ordenacao(serie)
+    validas = np.flatnonzero(~vazios)
+    valores = chave[validas]
+    n = len(validas)
+    k = min(fim, n)
+    if k > 0:
+        if k < n:
+            # Entram todas as linhas iguais ao valor de corte: o desempate entre elas é feito na ordenação
+            if crescente:
+                corte = np.flatnonzero(valores <= np.partition(valores, k - 1)[k - 1])
+            else:
+                corte = np.flatnonzero(valores >= np.partition(valores, n - k)[n - k])
+        else:
+            corte = np.arange(n)
+        # `corte` está em ordem de posição: a ordenação estável desempata pela posição
+        if crescente:
+            ordem = corte[np.argsort(valores[corte], kind="stable")]
+        else:
+            # Decrescente estável: ordena o trecho invertido e desfaz a inversão (empates seguem a posição)
+            m = len(corte)
+            ordem = corte[(m - 1 - np.argsort(valores[corte][::-1], kind="stable"))[::-1]]
+        ordem = ordem[:k]
+        topo = validas[ordem]
+    else:
+        topo = validas[:0]
+    if fim > n:
+        topo = np.concatenate([topo, np.flatnonzero(vazios)[:fim - n]])
+    return topo[inicio:fim]
+
+
+# Contagens do gráfico REGISTRO DE OS
+CONTAGENS_MENSAIS = ["geradas", "finalizadas", "valorizadas"]
+
+
+def _flags_mensais(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Máscaras das OS contadas em cada série: todas, finalizadas (fim + status FINALIZADA) e valorizadas."""
+    status = df["status"].fillna("").astype(str).str.strip().str.upper()
+    valor = df["valortotal"] if "valortotal" in df.columns else pd.Series(0, index=df.index)
+    return {
+        "geradas": np.ones(len(df), dtype=bool),
+        "finalizadas": (df["datahorafim"].notna() & (status == "FINALIZADA")).to_numpy(),
+        "valorizadas": valor.gt(0).to_numpy(),
+    }
+
+
+def _rotulo_mes(ano, mes) -> list:
+    """Rótulo 'AAAA-MM' (o mesmo de Period('M') em texto)."""
+    return [f"{a:04d}-{m:02d}" for a, m in zip(ano, mes)]
+
+
+def contagens_mensais(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contagens de OS distintas por mês de abertura direto das linhas (gráfico REGISTRO DE OS).
+    Índice 'Mês' ('AAAA-MM', em ordem) e colunas CONTAGENS_MENSAIS; OS sem data de abertura não entram.
+    """
+    df = df[df["datahoraos"].notna()]
+    chave = (df["datahoraos"].dt.year * 100 + df["datahoraos"].dt.month).to_numpy()
+    numeroos = df["numeroos"].to_numpy()
+    colunas = {
+        nome: pd.Series(numeroos[flag]).groupby(chave[flag]).nunique()
+        for nome, flag in _flags_mensais(df).items()
+    }
+    resultado = pd.DataFrame(colunas).fillna(0).astype(int).sort_index()
+    resultado.index = pd.Index(_rotulo_mes(resultado.index // 100, resultado.index % 100), name="Mês")
+    return resultado
+
+
+def fatos_mensais(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabela fato mensal: uma linha por (ano, mês de abertura, valores das FILTER_COLUMNS),
+    com as contagens de OS geradas, finalizadas e valorizadas. Supõe uma linha por OS.
+    As chaves viram um único inteiro (códigos em base mista): agrupar é um np.unique + bincount.
+    """
+    df = df[df["datahoraos"].notna()]
+    dimensoes = [c for c in FILTER_COLUMNS if c in df.columns]
+    periodo, periodos = pd.factorize(df["datahoraos"].dt.year * 100 + df["datahoraos"].dt.month, sort=True)
+    codigos, uniques = [periodo], []
+    for coluna in dimensoes:
+        codes, valores = pd.factorize(df[coluna])
+        # +1: o código 0 fica para valores vazios
+        codigos.append(codes + 1)
+        uniques.append(pd.Index(np.asarray(valores)))
+    tamanhos = [len(periodos)] + [len(u) + 1 for u in uniques]
+    chave = np.ravel_multi_index(codigos, tamanhos) if len(df) else np.zeros(0, dtype=np.int64)
+    chaves, grupo = np.unique(chave, return_inverse=True)
+    partes = np.unravel_index(chaves, tamanhos)
+
+    periodos = np.asarray(periodos)[partes[0]]
+    fatos = pd.DataFrame({
+        "ano": (periodos // 100).astype("int16"),
+        "mes": (periodos % 100).astype("int8"),
+        **{c: pd.Categorical.from_codes(p - 1, categories=u) for c, u, p in zip(dimensoes, uniques, partes[1:])},
+    })
+    for nome, flag in _flags_mensais(df).items():
+        fatos[nome] = np.bincount(grupo, weights=flag, minlength=len(chaves)).astype("int32")
+    return fatos
+
+
+class RollupMensal:
+    """
+    Tabela fato mensal pré-calculada uma vez por versão dos dados (ou lida do resumo no banco).
+    `contagens` soma as linhas da tabela que atendem aos filtros: o custo depende do número de
+    combinações mês x dimensões, não do número de OS.
+    """
+
+    def __init__(self, fatos: pd.DataFrame):
+        self.size = len(fatos)
+        self.ano = fatos["ano"].to_numpy()
+        self.mes = fatos["mes"].to_numpy()
+        self.codes = {}
+        self.categorias = {}
+        for coluna in FILTER_COLUMNS:
+            if coluna in fatos.columns:
+                codes, uniques = pd.factorize(fatos[coluna])
+                self.codes[coluna] = codes
+                self.categorias[coluna] = pd.Index(np.asarray(uniques, dtype=object))
+        chave = self.ano.astype(np.int32) * 100 + self.mes
+        self._periodo, periodos = pd.factorize(chave, sort=True)
+        self.meses = pd.Index(_rotulo_mes(periodos // 100, periodos % 100), name="Mês")
+        self.valores = {nome: fatos[nome].to_numpy(dtype=np.int64) for nome in CONTAGENS_MENSAIS}
+
+    def contagens(self, anos: Optional[Iterable[int]] = None, meses: Optional[Iterable[int]] = None,
+                  valores: Optional[Dict[str, Iterable]] = None) -> pd.DataFrame:
+        """Mesmo resultado de contagens_mensais sobre as OS que atendem aos filtros (mesmos argumentos de FilterIndex.select)."""
+        mask = np.ones(self.size, dtype=bool)
+        if anos:
+            mask &= np.isin(self.ano, list(anos))
+        if meses:
+            mask &= np.isin(self.mes, list(meses))
+        for coluna, selecionados in (valores or {}).items():
+            if selecionados and coluna in self.codes:
+                mask &= _mascara_codigos(self.codes[coluna], self.categorias[coluna], selecionados)
+        periodo = self._periodo[mask]
+        resultado = pd.DataFrame({
+            nome: np.bincount(periodo, weights=valores[mask], minlength=len(self.meses)).astype(int)
+            for nome, valores in self.valores.items()
+        }, index=self.meses)
+        return resultado[resultado["geradas"] > 0]
+
+
+def opcoes_filtros(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Opções dos filtros da sidebar (uma vez por versão dos dados): 'anos' (decrescente), 'meses',
+    'numeroos' (array ordenado, para buscar_numeros_os) e os valores de cada coluna de FILTER_COLUMNS, em ordem.
+    """
+    datas = df["datahoraos"]
+    opcoes = {
+        "anos": sorted(datas.dt.year.dropna().unique().astype(int).tolist(), reverse=True),
+        "meses": sorted(datas.dt.month.dropna().unique().astype(int).tolist()),
+        "numeroos": np.sort(pd.unique(df["numeroos"].dropna().to_numpy().astype(np.int64))),
+    }
+    for coluna in FILTER_COLUMNS:
+        if coluna in df.columns:
+            opcoes[coluna] = sorted(df[coluna].dropna().unique())
+    return opcoes
+
+
+def buscar_numeros_os(numeros: np.ndarray, trecho: str, limite: int = 50) -> List[int]:
+    """
+    Números de OS que começam com `trecho` (só dígitos), em ordem crescente, até `limite`.
+    `numeros` deve estar ordenado: para cada quantidade de dígitos a mais, os números com o prefixo
+    formam a faixa [prefixo·10^k, (prefixo+1)·10^k), achada por busca binária.
+    """
+    trecho = (trecho or "").strip()
+    if not trecho.isdigit() or len(numeros) == 0:
+        return []
+    prefixo = int(trecho)
+    if trecho != str(prefixo):
+        # Zeros à esquerda: nenhum número começa assim
+        return []
+    encontrados = []
+    # Prefixo 0: só o próprio 0 (faixas [0, 10^k) repetiriam os números)
+    digitos_extras = 0 if prefixo == 0 else len(str(int(numeros[-1]))) - len(trecho)
+    for k in range(digitos_extras + 1):
+        inicio = np.searchsorted(numeros, prefixo * 10 ** k, side="left")
+        fim = np.searchsorted(numeros, (prefixo + 1) * 10 ** k, side="left")
+        encontrados.extend(numeros[inicio:min(fim, inicio + limite - len(encontrados))].tolist())
+        if len(encontrados) >= limite:
+            break
+    return encontrados
@@ -0,0 +1,46 @@
+"""
+Repositório de dados compartilhado por todas as sessões do processo.
+- Guarda o histórico (DataFrame já tipado), o índice das OS em andamento, os payloads de detalhes da API
+  e o estado da sincronização incremental.
+- Cada publicação incrementa `version`; leitores usam a versão como chave de cache.
+- Os dados publicados não são alterados depois: cada atualização publica objetos novos.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+
+class DatasetStore:
+    """Conjunto de dados único do processo, versionado e publicado de forma atômica."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self.historico: Optional[pd.DataFrame] = None
+        # OS em andamento do histórico (poucas linhas), mantidas pela sincronização a partir do delta
+        self.andamento: Optional[pd.DataFrame] = None
+        self.api_details: Optional[list] = None
+        self.sync_watermark = None
+        self.details_lastupdate: Dict[Any, Any] = {}
+        self.last_update: Optional[str] = None
+        # Relatório da última sincronização de detalhes (consultas feitas e evitadas)
+        self.sync_report: Optional[Dict[str, Any]] = None
+
+    @property
+    def has_historico(self) -> bool:
+        return self.historico is not None and not self.historico.empty
+
+    @property
+    def has_detalhes(self) -> bool:
+        return self.has_historico and bool(self.api_details)
+
+    def publish(self, **changes) -> int:
+        """Substitui os campos informados e incrementa a versão. Retorna a nova versão."""
+        with self._lock:
+            for name, value in changes.items():
+                if not hasattr(self, name) or name.startswith("_"):
+                    raise AttributeError(f"Campo desconhecido no repositório: {name}")
+                setattr(self, name, value)
+            self.version += 1
+            return self.version
@@ -2,14 +2,27 @@
 Módulo de banco de dados MySQL (Aiven Cloud) para armazenar OS finalizadas e detalhes.
 - ultimaatualizacao: apenas OS com status FINALIZADA e datahorainicio/datahorafim preenchidos.
 - detalhesOS: itens de material/valor por OS.
+- os_mensal: resumo mensal (contagens por mês e dimensões de filtro) do gráfico REGISTRO DE OS.
 Configuração: no Streamlit Cloud use Secrets (TOML); localmente use variável de ambiente.
+Conexões: pool único por processo (DB_POOL_SIZE); o próprio pool faz ping e reconecta antes de entregar cada conexão.
+Schema versionado (tabela schema_version); init_db aplica as migrações pendentes.
 """
+import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import List, Dict, Any
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import List, Dict, Any, Optional, Tuple
 
-import mysql.connector
-from mysql.connector import Error
+import pandas as pd
+from mysql.connector import pooling
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_BATCH_SIZE = 500
 
 
 def _get_database_config() -> Dict[str, Any]:
@@ -51,6 +64,87 @@ def _get_database_config() -> Dict[str, Any]:
     return config
 
 
+def _get_pool_size() -> int:
+    """Tamanho do pool: st.secrets DB_POOL_SIZE, depois variável de ambiente, depois o padrão."""
+    try:
+        import streamlit as st
+        if hasattr(st, "secrets") and "DB_POOL_SIZE" in st.secrets:
+            return int(st.secrets["DB_POOL_SIZE"])
+    except Exception:
+        pass
+    return int(os.environ.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+# --- Pool de conexões (um por processo) ---
+# (pool, semáforo de vagas): criados juntos sob o lock e publicados numa única atribuição
+_pool: Optional[Tuple[pooling.MySQLConnectionPool, threading.BoundedSemaphore]] = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_pool_stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0}
+
+
+def _get_pool() -> Tuple[pooling.MySQLConnectionPool, threading.BoundedSemaphore]:
+    """
+    Retorna (pool, semáforo de vagas), criados na primeira chamada; a configuração é lida uma única vez.
+    O par vem de uma única leitura de _pool: nunca mistura um pool com o semáforo de outro (reset_pool).
+    """
+    global _pool
+    estado = _pool
+    if estado is None:
+        with _pool_lock:
+            if _pool is None:
+                size = max(1, min(_get_pool_size(), pooling.CNX_POOL_MAXSIZE))
+                pool = pooling.MySQLConnectionPool(
+                    pool_name="dashboard_manutencao",
+                    pool_size=size,
+                    pool_reset_session=True,
+                    **_get_database_config(),
+                )
+                _pool = (pool, threading.BoundedSemaphore(size))
+            estado = _pool
+    return estado
+
+
+def _add_stat(key: str, value=1):
+    with _stats_lock:
+        _pool_stats[key] += value
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Retorna os contadores do pool: checkouts, esperas e tempo total de espera."""
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    estado = _pool
+    stats["pool_size"] = estado[0].pool_size if estado is not None else 0
+    return stats
+
+
+def reset_pool():
+    """Descarta o pool atual (ex.: após trocar credenciais); o próximo uso cria um novo."""
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _checkout(pool, slots):
+    """
+    Obtém uma conexão do pool, esperando por uma vaga livre.
+    pool.get_connection() já faz o ping e reconecta conexões derrubadas pelo servidor.
+    """
+    if not slots.acquire(blocking=False):
+        started = time.monotonic()
+        slots.acquire()
+        _add_stat("waits")
+        _add_stat("wait_seconds", time.monotonic() - started)
+    try:
+        conn = pool.get_connection()
+    except Exception:
+        slots.release()
+        raise
+    _add_stat("checkouts")
+    return conn
+
+
 # Campos da API last-update (registro de OS)
 OS_COLUMNS = [
     "numeroos", "datahoraos", "datahorainicio", "datahorafim",
@@ -62,27 +156,90 @@ OS_COLUMNS = [
 # Campos da API os-details
 DETALHES_COLUMNS = ["numeroos", "material", "quantidade", "valorunit", "valortotal", "quantidadeestoque"]
 
+# Tipos do schema v2 (a v1 guardava tudo como TEXT)
+OS_DATETIME_COLUMNS = ["datahoraos", "datahorainicio", "datahorafim", "lastupdate"]
+OS_VARCHAR_COLUMNS = {
+    "placaequipamento": 32, "marcaequipamento": 100, "modeloequipamento": 100, "hodometro": 32,
+    "titulomanutencao": 255, "tipomanutencao": 100, "status": 32,
+    "motoristaresponsavel": 255, "mecanicoresponsavel": 255, "fornecedor": 255,
+}
+OS_INDEXES = {
+    "idx_os_placa": "placaequipamento",
+    "idx_os_datahoraos": "datahoraos",
+    "idx_os_status": "status",
+    "idx_os_lastupdate": "lastupdate",
+}
+DETALHES_DECIMAL_COLUMNS = {
+    "quantidade": "DECIMAL(15,4)",
+    "valorunit": "DECIMAL(15,4)",
+    "valortotal": "DECIMAL(15,2)",
+    "quantidadeestoque": "DECIMAL(15,4)",
+}
+# Resumo os_mensal: dimensões de filtro (mesmos nomes de ultimaatualizacao) + situação calculada
+OS_MENSAL_DIMENSOES = ["marcaequipamento", "placaequipamento", "titulomanutencao", "motoristaresponsavel"]
+OS_MENSAL_CONTAGENS = ["geradas", "finalizadas", "valorizadas"]
+SCHEMA_VERSION = 4
+
+
+def _para_datetime(value) -> Optional[datetime]:
+    """Converte o texto de data da API para datetime (sem fuso); inválido ou vazio vira None."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    ts = pd.to_datetime(value, errors="coerce")
+    if pd.isna(ts):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.to_pydatetime()
+
+
+def _para_decimal(value) -> Optional[Decimal]:
+    """Converte valores numéricos da API para Decimal; inválido ou vazio vira None."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        result = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    return result if result.is_finite() else None
+
+
+def _valor_os(item: Dict[str, Any], coluna: str):
+    """Valor de uma coluna de OS já no tipo do schema."""
+    if coluna in OS_DATETIME_COLUMNS:
+        return _para_datetime(item.get(coluna))
+    return item.get(coluna)
+
 
 @contextmanager
 def get_connection():
-    """Context manager para conexão com o MySQL."""
-    config = _get_database_config()
-    conn = None
+    """Context manager para conexão com o MySQL (emprestada do pool e devolvida ao final)."""
+    pool, slots = _get_pool()
+    conn = _checkout(pool, slots)
     try:
-        conn = mysql.connector.connect(**config)
-        yield conn
-        conn.commit()
-    except Error as e:
-        if conn:
-            conn.rollback()
-        raise
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            # Falha no rollback (ex.: conexão caída) não substitui a exceção original
+            try:
+                conn.rollback()
+            except Exception:
+                logger.warning("Falha no rollback da conexão do pool", exc_info=True)
+            raise
+        finally:
+            # Em conexões do pool, close() devolve a conexão ao pool (e reseta a sessão, que falha se ela caiu)
+            try:
+                conn.close()
+            except Exception:
+                logger.warning("Falha ao devolver a conexão ao pool", exc_info=True)
     finally:
-        if conn and conn.is_connected():
-            conn.close()
+        # A vaga é liberada em qualquer caso: vaga perdida bloquearia get_connection para sempre
+        slots.release()
 
 
 def init_db():
-    """Cria as tabelas se não existirem (sintaxe MySQL)."""
+    """Cria as tabelas se não existirem (sintaxe MySQL) e aplica as migrações pendentes."""
     with get_connection() as conn:
         cur = conn.cursor()
         
@@ -124,6 +281,131 @@ def init_db():
         """)
         
         conn.commit()
+    
+    migrar_schema()
+
+
+# --- Migrações de schema ---
+def _versao_schema(cur) -> int:
+    """Versão atual do schema (bancos anteriores ao controle de versão são v1)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            aplicado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    cur.execute("SELECT COALESCE(MAX(version), 1) FROM schema_version")
+    return int(cur.fetchone()[0])
+
+
+def _colunas(cur, tabela: str) -> Dict[str, str]:
+    """Retorna {coluna: tipo} da tabela, com o tipo em minúsculas."""
+    cur.execute(f"SHOW COLUMNS FROM {tabela}")
+    return {row[0]: str(row[1]).lower() for row in cur.fetchall()}
+
+
+def _converter_colunas(conn, tabela: str, pk: str, tipos: Dict[str, str], conversor, batch_size: int):
+    """
+    Converte colunas TEXT para `tipos` ({coluna: tipo SQL}) sem perder dados:
+    cria colunas sombra, preenche em lotes pela chave primária e troca as colunas.
+    Pode ser reexecutada se for interrompida no meio.
+    """
+    cur = conn.cursor()
+    existentes = _colunas(cur, tabela)
+    pendentes = {c: t for c, t in tipos.items() if existentes.get(c, "").endswith("text")}
+    if not pendentes:
+        return
+    
+    novas = [f"ADD COLUMN {c}_novo {t} NULL" for c, t in pendentes.items() if f"{c}_novo" not in existentes]
+    if novas:
+        cur.execute(f"ALTER TABLE {tabela} {', '.join(novas)}")
+    
+    cols = list(pendentes)
+    select_sql = f"SELECT {pk}, {', '.join(cols)} FROM {tabela} WHERE {pk} > %s ORDER BY {pk} LIMIT %s"
+    update_sql = f"UPDATE {tabela} SET {', '.join(f'{c}_novo = %s' for c in cols)} WHERE {pk} = %s"
+    ultimo = -1
+    while True:
+        cur.execute(select_sql, (ultimo, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        cur.executemany(update_sql, [[conversor(v) for v in row[1:]] + [row[0]] for row in rows])
+        conn.commit()
+        ultimo = rows[-1][0]
+    
+    trocas = [f"DROP COLUMN {c}, CHANGE COLUMN {c}_novo {c} {t} NULL" for c, t in pendentes.items()]
+    cur.execute(f"ALTER TABLE {tabela} {', '.join(trocas)}")
+
+
+def _migracao_2_tipos(conn, batch_size: int):
+    """v2: DATETIME/DECIMAL/VARCHAR nas tabelas e índices secundários em ultimaatualizacao."""
+    _converter_colunas(conn, "ultimaatualizacao", "numeroos",
+                       {c: "DATETIME" for c in OS_DATETIME_COLUMNS}, _para_datetime, batch_size)
+    _converter_colunas(conn, "detalhesOS", "id", DETALHES_DECIMAL_COLUMNS, _para_decimal, batch_size)
+    
+    cur = conn.cursor()
+    # VARCHAR nunca menor que o maior valor já gravado
+    existentes = _colunas(cur, "ultimaatualizacao")
+    modificacoes = []
+    textos = [c for c in OS_VARCHAR_COLUMNS if existentes.get(c, "").endswith("text")]
+    if textos:
+        cur.execute(f"SELECT {', '.join(f'COALESCE(MAX(CHAR_LENGTH({c})), 0)' for c in textos)} FROM ultimaatualizacao")
+        maiores = cur.fetchone()
+        for coluna, maior in zip(textos, maiores):
+            tamanho = max(OS_VARCHAR_COLUMNS[coluna], int(maior))
+            modificacoes.append(f"MODIFY COLUMN {coluna} VARCHAR({tamanho}) NULL")
+    
+    cur.execute("SHOW INDEX FROM ultimaatualizacao")
+    indices = {row[2] for row in cur.fetchall()}
+    modificacoes += [f"ADD INDEX {nome} ({coluna})" for nome, coluna in OS_INDEXES.items() if nome not in indices]
+    if modificacoes:
+        cur.execute(f"ALTER TABLE ultimaatualizacao {', '.join(modificacoes)}")
+
+
+def _migracao_3_detalhes_sincronizados(conn, batch_size: int):
+    """
+    v3: coluna detalhessync em ultimaatualizacao (lastupdate vigente quando os detalhes foram gravados).
+    Permite reconhecer também OS sem nenhum item de material, que não deixam linhas em detalhesOS.
+    """
+    cur = conn.cursor()
+    if "detalhessync" not in _colunas(cur, "ultimaatualizacao"):
+        cur.execute("ALTER TABLE ultimaatualizacao ADD COLUMN detalhessync DATETIME NULL")
+
+
+def _migracao_4_os_mensal(conn, batch_size: int):
+    """v4: tabela de resumo os_mensal (mesmas larguras das colunas de ultimaatualizacao), já preenchida."""
+    cur = conn.cursor()
+    existentes = _colunas(cur, "ultimaatualizacao")
+    dimensoes = ", ".join(f"{c} {existentes.get(c, 'varchar(255)').upper()} NULL" for c in OS_MENSAL_DIMENSOES)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS os_mensal (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            mes DATE NOT NULL,
+            {dimensoes},
+            situacao VARCHAR(32) NOT NULL,
+            geradas INT NOT NULL,
+            finalizadas INT NOT NULL,
+            valorizadas INT NOT NULL,
+            INDEX idx_os_mensal_mes (mes)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    _recalcular_os_mensal(cur, None, batch_size)
+
+
+MIGRACOES = {2: _migracao_2_tipos, 3: _migracao_3_detalhes_sincronizados, 4: _migracao_4_os_mensal}
+
+
+def migrar_schema(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Aplica, em ordem, as migrações ainda não registradas em schema_version. Retorna a versão final."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        atual = _versao_schema(cur)
+        for versao in sorted(v for v in MIGRACOES if v > atual):
+            MIGRACOES[versao](conn, batch_size)
+            cur.execute("INSERT INTO schema_version (version) VALUES (%s)", (versao,))
+            conn.commit()
+            atual = versao
+        return atual
 
 
 def _row_to_dict(row, columns) -> Dict[str, Any]:
@@ -149,70 +431,95 @@ def os_atende_criterios(item: Dict[str, Any]) -> bool:
     )
 
 
-def inserir_os_lote(itens: List[Dict[str, Any]]) -> int:
+def _chunks(seq: List[Any], size: int):
+    """Divide a sequência em blocos de até `size` itens."""
+    size = max(1, int(size))
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def inserir_os_lote(itens: List[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
     """
     Insere ou atualiza OS na tabela ultimaatualizacao.
     Espera apenas itens que já atendam aos critérios (FINALIZADA + datas).
+    Grava em INSERT multi-linha de até `batch_size` OS, numa única transação.
     Retorna quantidade de registros inseridos/atualizados.
     """
     if not itens:
         return 0
     
+    row_placeholder = "(" + ", ".join(["%s"] * len(OS_COLUMNS)) + ")"
+    cols = ", ".join(OS_COLUMNS)
+    
+    # MySQL usa INSERT ... ON DUPLICATE KEY UPDATE
+    update_parts = [f"{c} = VALUES({c})" for c in OS_COLUMNS if c != "numeroos"]
+    update_clause = ", ".join(update_parts)
+    
     with get_connection() as conn:
         cur = conn.cursor()
-        placeholders = ", ".join(["%s"] * len(OS_COLUMNS))
-        cols = ", ".join(OS_COLUMNS)
-        
-        # MySQL usa INSERT ... ON DUPLICATE KEY UPDATE
-        update_parts = [f"{c} = VALUES({c})" for c in OS_COLUMNS if c != "numeroos"]
-        update_clause = ", ".join(update_parts)
-        
-        upsert_sql = f"""
-            INSERT INTO ultimaatualizacao ({cols}) 
-            VALUES ({placeholders})
-            ON DUPLICATE KEY UPDATE {update_clause}
-        """
-        
         count = 0
-        for item in itens:
-            row = [item.get(c) for c in OS_COLUMNS]
-            cur.execute(upsert_sql, row)
-            count += 1
+        for bloco in _chunks(itens, batch_size):
+            upsert_sql = f"""
+                INSERT INTO ultimaatualizacao ({cols}) 
+                VALUES {", ".join([row_placeholder] * len(bloco))}
+                ON DUPLICATE KEY UPDATE {update_clause}
+            """
+            params = [_valor_os(item, c) for item in bloco for c in OS_COLUMNS]
+            cur.execute(upsert_sql, params)
+            count += len(bloco)
         
         return count
 
 
-def inserir_detalhes_os(numeroos: int, itens: List[Dict[str, Any]]) -> int:
+def inserir_detalhes_lote(detalhes_por_os: Dict[int, List[Dict[str, Any]]],
+                          batch_size: int = DEFAULT_BATCH_SIZE) -> int:
     """
-    Insere os detalhes de uma OS na tabela detalhesOS.
-    Remove detalhes antigos dessa OS antes de inserir (replace).
+    Substitui os detalhes de várias OS numa única transação:
+    um DELETE ... WHERE numeroos IN (...) por bloco de OS, seguido de INSERT multi-linha.
     Retorna quantidade de linhas inseridas.
     """
+    if not detalhes_por_os:
+        return 0
+    
+    numeros = list(detalhes_por_os.keys())
+    rows = [
+        (
+            numeroos,
+            item.get("material"),
+            _para_decimal(item.get("quantidade")),
+            _para_decimal(item.get("valorunit")),
+            _para_decimal(item.get("valortotal")),
+            _para_decimal(item.get("quantidadeestoque")),
+        )
+        for numeroos, itens in detalhes_por_os.items()
+        for item in (itens or [])
+    ]
+    
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute("DELETE FROM detalhesOS WHERE numeroos = %s", (numeroos,))
-        
-        if not itens:
-            return 0
-        
-        insert_sql = """
-            INSERT INTO detalhesOS (numeroos, material, quantidade, valorunit, valortotal, quantidadeestoque)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
+        for bloco in _chunks(numeros, batch_size):
+            cur.execute(
+                f"DELETE FROM detalhesOS WHERE numeroos IN ({', '.join(['%s'] * len(bloco))})",
+                bloco,
+            )
         
-        count = 0
-        for item in itens:
-            cur.execute(insert_sql, (
-                numeroos,
-                item.get("material"),
-                item.get("quantidade"),
-                item.get("valorunit"),
-                item.get("valortotal"),
-                item.get("quantidadeestoque"),
-            ))
-            count += 1
+        for bloco in _chunks(rows, batch_size):
+            insert_sql = f"""
+                INSERT INTO detalhesOS (numeroos, material, quantidade, valorunit, valortotal, quantidadeestoque)
+                VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(bloco))}
+            """
+            cur.execute(insert_sql, [value for row in bloco for value in row])
         
-        return count
+        return len(rows)
+
+
+def inserir_detalhes_os(numeroos: int, itens: List[Dict[str, Any]]) -> int:
+    """
+    Insere os detalhes de uma OS na tabela detalhesOS.
+    Remove detalhes antigos dessa OS antes de inserir (replace).
+    Retorna quantidade de linhas inseridas.
+    """
+    return inserir_detalhes_lote({numeroos: itens})
 
 
 def listar_numeroos_com_detalhes() -> List[int]:
@@ -246,6 +553,38 @@ def listar_os_sem_detalhes() -> List[int]:
         return [r[0] for r in cur.fetchall()]
 
 
+def listar_detalhes_sincronizados() -> Dict[int, Optional[datetime]]:
+    """
+    Retorna {numeroos: lastupdate} das OS cujos detalhes gravados correspondem ao lastupdate atual:
+    detalhessync igual ao lastupdate, ou (linhas anteriores à v3) OS que já têm linhas em detalhesOS.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT u.numeroos, u.lastupdate FROM ultimaatualizacao u
+            WHERE u.detalhessync <=> u.lastupdate
+               OR (u.detalhessync IS NULL AND EXISTS (SELECT 1 FROM detalhesOS d WHERE d.numeroos = u.numeroos))
+        """)
+        return {r[0]: r[1] for r in cur.fetchall()}
+
+
+def marcar_detalhes_sincronizados(numeros: List[int], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Registra que os detalhes das OS foram gravados para o lastupdate atual de cada uma."""
+    if not numeros:
+        return 0
+    total = 0
+    with get_connection() as conn:
+        cur = conn.cursor()
+        for bloco in _chunks(list(numeros), batch_size):
+            cur.execute(
+                f"UPDATE ultimaatualizacao SET detalhessync = lastupdate "
+                f"WHERE numeroos IN ({', '.join(['%s'] * len(bloco))})",
+                bloco,
+            )
+            total += cur.rowcount
+    return total
+
+
 def listar_todas_os_ultimaatualizacao() -> List[int]:
     """Retorna todos os numeroos da tabela ultimaatualizacao."""
     with get_connection() as conn:
@@ -254,11 +593,36 @@ def listar_todas_os_ultimaatualizacao() -> List[int]:
         return [r[0] for r in cur.fetchall()]
 
 
-def buscar_os_para_dashboard() -> List[Dict[str, Any]]:
-    """Retorna todos os registros de ultimaatualizacao para uso no dashboard."""
+def _filtros_os(data_inicio=None, data_fim=None, placas=None, status=None, alias: str = ""):
+    """Monta a cláusula WHERE (e parâmetros) dos filtros de OS, aproveitando os índices do schema v2."""
+    prefixo = f"{alias}." if alias else ""
+    condicoes, params = [], []
+    if data_inicio is not None:
+        condicoes.append(f"{prefixo}datahoraos >= %s")
+        params.append(data_inicio)
+    if data_fim is not None:
+        condicoes.append(f"{prefixo}datahoraos < %s")
+        params.append(data_fim)
+    if placas:
+        condicoes.append(f"{prefixo}placaequipamento IN ({', '.join(['%s'] * len(placas))})")
+        params.extend(placas)
+    if status:
+        condicoes.append(f"{prefixo}status IN ({', '.join(['%s'] * len(status))})")
+        params.extend(status)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return where, params
+
+
+def buscar_os_para_dashboard(data_inicio=None, data_fim=None, placas: Optional[List[str]] = None,
+                             status: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Retorna os registros de ultimaatualizacao para uso no dashboard.
+    Filtros opcionais (período de abertura [data_inicio, data_fim), placas, status) são aplicados no MySQL.
+    """
+    where, params = _filtros_os(data_inicio, data_fim, placas, status)
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM ultimaatualizacao ORDER BY numeroos")
+        cur.execute(f"SELECT * FROM ultimaatualizacao {where} ORDER BY numeroos", params)
         columns = [desc[0] for desc in cur.description]
         return [_row_to_dict(r, columns) for r in cur.fetchall()]
 
@@ -273,3 +637,160 @@ def buscar_detalhes_para_dashboard() -> List[Dict[str, Any]]:
         """)
         columns = [desc[0] for desc in cur.description]
         return [_row_to_dict(r, columns) for r in cur.fetchall()]
+
+
+def _cursor_para_df(cur) -> pd.DataFrame:
+    """Monta um DataFrame direto do resultado do cursor."""
+    columns = [desc[0] for desc in cur.description]
+    return pd.DataFrame.from_records(cur.fetchall(), columns=columns)
+
+
+def buscar_os_df(data_inicio=None, data_fim=None, placas: Optional[List[str]] = None,
+                 status: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Retorna as OS como DataFrame, com `valortotal` = SUM(detalhesOS.valortotal) por OS calculado no MySQL.
+    Aceita os mesmos filtros de buscar_os_para_dashboard.
+    """
+    where, params = _filtros_os(data_inicio, data_fim, placas, status, alias="u")
+    colunas = ", ".join(f"u.{c}" for c in OS_COLUMNS)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {colunas}, COALESCE(d.valortotal, 0) AS valortotal
+            FROM ultimaatualizacao u
+            LEFT JOIN (
+                SELECT numeroos, SUM(valortotal) AS valortotal
+                FROM detalhesOS GROUP BY numeroos
+            ) d ON d.numeroos = u.numeroos
+            {where}
+            ORDER BY u.numeroos
+        """, params)
+        df = _cursor_para_df(cur)
+    df["valortotal"] = pd.to_numeric(df["valortotal"], errors="coerce").fillna(0).astype(float)
+    for col in OS_DATETIME_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def buscar_detalhes_df() -> pd.DataFrame:
+    """Retorna detalhesOS como DataFrame, com as colunas numéricas em float."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT numeroos, material, quantidade, valorunit, valortotal, quantidadeestoque
+            FROM detalhesOS ORDER BY numeroos, id
+        """)
+        df = _cursor_para_df(cur)
+    for col in DETALHES_DECIMAL_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    return df
+
+
+# --- Resumo mensal (os_mensal) ---
+# Mesmas regras (e precedência) de data_processing.classify_os_status
+_SQL_FINALIZADA = "(u.datahorafim IS NOT NULL AND UPPER(TRIM(COALESCE(u.status, ''))) = 'FINALIZADA')"
+_SQL_SITUACAO = f"""
+    CASE
+        WHEN COALESCE(d.valortotal, 0) > 0 AND {_SQL_FINALIZADA} THEN 'VALORIZADO E FINALIZADO'
+        WHEN u.datahorainicio IS NOT NULL AND u.datahorafim IS NULL THEN 'ANDAMENTO'
+        WHEN COALESCE(d.valortotal, 0) > 0 AND u.datahorafim IS NULL THEN 'EXECUTADO'
+        WHEN {_SQL_FINALIZADA} THEN 'FINALIZADA'
+        WHEN u.datahorainicio IS NULL AND u.datahorafim IS NULL THEN 'EM BRANCO'
+        ELSE 'OUTRO'
+    END
+"""
+# Primeiro dia do mês de abertura (sem DATE_FORMAT: '%' conflita com os parâmetros do conector)
+_SQL_MES = "DATE(DATE_SUB(u.datahoraos, INTERVAL DAYOFMONTH(u.datahoraos) - 1 DAY))"
+
+
+def _inicio_mes(valor) -> Optional[datetime]:
+    """Primeiro dia do mês de uma data (texto, datetime ou date); vazio/inválido vira None."""
+    ts = _para_datetime(valor) if isinstance(valor, str) else valor
+    if ts is None or pd.isna(ts):
+        return None
+    return datetime(ts.year, ts.month, 1)
+
+
+def _proximo_mes(mes: datetime) -> datetime:
+    return datetime(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def _recalcular_os_mensal(cur, meses: Optional[List[datetime]], batch_size: int) -> int:
+    """Apaga e recalcula as linhas de os_mensal dos meses informados (None: a tabela inteira). Retorna as linhas gravadas."""
+    dimensoes = ", ".join(OS_MENSAL_DIMENSOES)
+    select_sql = f"""
+        INSERT INTO os_mensal (mes, {dimensoes}, situacao, {", ".join(OS_MENSAL_CONTAGENS)})
+        SELECT mes, {dimensoes}, situacao, COUNT(*), SUM(finalizada), SUM(valorizada)
+        FROM (
+            SELECT {_SQL_MES} AS mes, {", ".join(f"u.{c}" for c in OS_MENSAL_DIMENSOES)},
+                   {_SQL_SITUACAO} AS situacao,
+                   {_SQL_FINALIZADA} AS finalizada,
+                   COALESCE(d.valortotal, 0) > 0 AS valorizada
+            FROM ultimaatualizacao u
+            LEFT JOIN (
+                SELECT numeroos, SUM(valortotal) AS valortotal
+                FROM detalhesOS GROUP BY numeroos
+            ) d ON d.numeroos = u.numeroos
+            WHERE u.datahoraos IS NOT NULL {{periodo}}
+        ) t
+        GROUP BY mes, {dimensoes}, situacao
+    """
+    if meses is None:
+        cur.execute("DELETE FROM os_mensal")
+        cur.execute(select_sql.format(periodo=""))
+        return cur.rowcount
+    gravadas = 0
+    for bloco in _chunks(sorted(meses), batch_size):
+        cur.execute(f"DELETE FROM os_mensal WHERE mes IN ({', '.join(['%s'] * len(bloco))})", [m.date() for m in bloco])
+        # Faixas de datahoraos: aproveitam o índice idx_os_datahoraos
+        faixas = " OR ".join(["(u.datahoraos >= %s AND u.datahoraos < %s)"] * len(bloco))
+        cur.execute(select_sql.format(periodo=f"AND ({faixas})"),
+                    [valor for mes in bloco for valor in (mes, _proximo_mes(mes))])
+        gravadas += cur.rowcount
+    return gravadas
+
+
+def meses_das_os(numeros: List[int], batch_size: int = DEFAULT_BATCH_SIZE) -> set:
+    """Meses de abertura (primeiro dia) com que as OS estão gravadas hoje em ultimaatualizacao."""
+    meses = set()
+    if not numeros:
+        return meses
+    with get_connection() as conn:
+        cur = conn.cursor()
+        for bloco in _chunks(list(numeros), batch_size):
+            cur.execute(
+                f"SELECT DISTINCT {_SQL_MES} FROM ultimaatualizacao u "
+                f"WHERE u.datahoraos IS NOT NULL AND u.numeroos IN ({', '.join(['%s'] * len(bloco))})",
+                bloco,
+            )
+            meses.update(_inicio_mes(r[0]) for r in cur.fetchall())
+    meses.discard(None)
+    return meses
+
+
+def atualizar_os_mensal(meses: Optional[List[Any]] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Atualiza o resumo os_mensal de forma incremental: só os meses informados (datas de qualquer dia
+    do mês) são recalculados, numa única transação. None recalcula tudo. Retorna as linhas gravadas.
+    """
+    if meses is not None:
+        meses = sorted({m for m in map(_inicio_mes, meses) if m is not None})
+        if not meses:
+            return 0
+    with get_connection() as conn:
+        return _recalcular_os_mensal(conn.cursor(), meses, batch_size)
+
+
+def buscar_os_mensal() -> pd.DataFrame:
+    """Resumo os_mensal como DataFrame: ano, mes, dimensões, situacao e as contagens."""
+    colunas = ", ".join(["mes", *OS_MENSAL_DIMENSOES, "situacao", *OS_MENSAL_CONTAGENS])
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {colunas} FROM os_mensal ORDER BY mes")
+        df = _cursor_para_df(cur)
+    mes = pd.to_datetime(df.pop("mes"))
+    df.insert(0, "ano", mes.dt.year.astype("int16"))
+    df.insert(1, "mes", mes.dt.month.astype("int8"))
+    for col in OS_MENSAL_CONTAGENS:
+        df[col] = pd.to_numeric(df[col]).astype("int32")
+    return df
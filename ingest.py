@@ -0,0 +1,179 @@
+"""
+Ingestão em streaming do payload do endpoint last-update.
+- A resposta é lida em blocos e cada registro da lista "data" é decodificado isoladamente:
+  nem o texto completo da resposta nem a árvore inteira de dicts ficam em memória.
+- Os registros são convertidos em lotes para colunas tipadas; o resultado é o DataFrame já com os tipos do dashboard.
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Union
+
+import pandas as pd
+
+HISTORICO_DATETIME_COLUMNS = ["datahoraos", "datahorainicio", "datahorafim"]
+CHUNK_SIZE = 256 * 1024
+LOTE_REGISTROS = 20_000
+
+_ESPACOS = " \t\r\n"
+
+
+class _LeitorJSON:
+    """Leitor incremental: decodifica um valor JSON por vez a partir de blocos de bytes (ou texto)."""
+
+    def __init__(self, blocos: Iterable[Union[bytes, str]]):
+        self._blocos = iter(blocos)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._fim = False
+
+    def _ler(self) -> bool:
+        """Acrescenta o próximo bloco ao buffer, descartando o que já foi consumido."""
+        if self._fim:
+            return False
+        for bloco in self._blocos:
+            if bloco:
+                texto = self._utf8.decode(bloco) if isinstance(bloco, bytes) else bloco
+                break
+        else:
+            texto = self._utf8.decode(b"", final=True)
+            self._fim = True
+        self._buf = self._buf[self._pos:] + texto
+        self._pos = 0
+        return True
+
+    def proximo(self) -> str:
+        """Próximo caractere significativo, sem consumi-lo ('' no fim da entrada)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _ESPACOS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._ler():
+                return ""
+
+    def consumir(self, esperado: str):
+        encontrado = self.proximo()
+        if encontrado != esperado:
+            raise ValueError(f"JSON inválido: esperado {esperado!r}, encontrado {encontrado!r}")
+        self._pos += 1
+
+    def valor(self) -> Any:
+        """Decodifica o próximo valor JSON completo (lendo mais blocos se ele estiver cortado)."""
+        self.proximo()
+        while True:
+            try:
+                valor, fim = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._ler():
+                    raise
+                continue
+            # Um número no fim do buffer pode continuar no próximo bloco
+            if fim == len(self._buf) and self._ler():
+                continue
+            self._pos = fim
+            return valor
+
+    def elementos(self) -> Iterator[Any]:
+        """Gera os elementos da lista JSON que começa na posição atual, consumindo até o ']' final."""
+        self.consumir("[")
+        if self.proximo() == "]":
+            self._pos += 1
+            return
+        decodificar = self._json.raw_decode
+        while True:
+            buf = self._buf
+            try:
+                valor, fim = decodificar(buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._ler():
+                    raise
+                continue
+            if fim == len(buf) and self._ler():
+                continue
+            # O elemento só é entregue depois de visto o separador: entrada truncada não gera registro parcial
+            # Caminho rápido: separador colado no próximo elemento (payload sem indentação)
+            if buf[fim:fim + 1] == "," and buf[fim + 1:fim + 2] not in ("", " ", "\t", "\r", "\n"):
+                self._pos = fim + 1
+                yield valor
+                continue
+            self._pos = fim
+            seguinte = self.proximo()
+            if seguinte not in (",", "]"):
+                raise ValueError(f"JSON inválido: esperado ',' ou ']', encontrado {seguinte!r}")
+            yield valor
+            if seguinte == "]":
+                break
+            self._pos += 1
+            self.proximo()
+        self.consumir("]")
+
+
+def iter_registros(blocos: Iterable[Union[bytes, str]], chave: str = "data") -> Iterator[Any]:
+    """
+    Percorre o objeto JSON de nível superior e gera um a um os elementos da lista `chave`.
+    Os demais campos do nível superior (ex.: status) são lidos e descartados.
+    """
+    leitor = _LeitorJSON(blocos)
+    leitor.consumir("{")
+    if leitor.proximo() == "}":
+        return
+    while True:
+        nome = leitor.valor()
+        leitor.consumir(":")
+        if nome == chave and leitor.proximo() == "[":
+            yield from leitor.elementos()
+        else:
+            leitor.valor()
+        if leitor.proximo() != ",":
+            break
+        leitor.consumir(",")
+    leitor.consumir("}")
+
+
+def normalizar_historico(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos do histórico: numeroos inteiro (registros sem numeroos são descartados) e colunas de data.
+    Sem registros (ex.: {"data": []}) devolve um DataFrame vazio que ainda tem numeroos e lastupdate.
+    """
+    if "numeroos" not in df.columns:
+        return pd.DataFrame({"numeroos": pd.Series(dtype="int64"), "lastupdate": pd.Series(dtype=object)})
+    df["numeroos"] = pd.to_numeric(df["numeroos"], errors="coerce")
+    df = df.dropna(subset=["numeroos"])
+    df["numeroos"] = df["numeroos"].astype("int64")
+    for col in HISTORICO_DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def ler_historico(blocos: Iterable[Union[bytes, str]], lote: int = LOTE_REGISTROS) -> pd.DataFrame:
+    """
+    Lê o payload do last-update em streaming e devolve o DataFrame do histórico já tipado.
+    Os registros são convertidos em lotes de `lote` linhas: só um lote de dicts existe por vez.
+    """
+    partes = []
+    registros = []
+    for registro in iter_registros(blocos, "data"):
+        if isinstance(registro, dict):
+            registros.append(registro)
+            if len(registros) >= lote:
+                partes.append(pd.DataFrame(registros))
+                registros = []
+    if registros or not partes:
+        partes.append(pd.DataFrame(registros))
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    del partes
+    # Coluna vazia num lote vira object na concatenação: refaz a inferência (ex.: volta a ser texto)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].infer_objects()
+    return normalizar_historico(df)
+
+
+def historico_da_resposta(response) -> pd.DataFrame:
+    """Histórico a partir de uma resposta `requests` aberta com stream=True."""
+    try:
+        return ler_historico(response.iter_content(chunk_size=CHUNK_SIZE))
+    finally:
+        response.close()
@@ -0,0 +1,69 @@
+"""
+Indicadores (cards) do dashboard calculados numa única passada vetorizada.
+Usado pelos cards gerais e pelos cards da análise por placa.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SITUACOES_FINALIZADAS = ["VALORIZADO E FINALIZADO", "FINALIZADA"]
+
+
+@dataclass(frozen=True)
+class KPIs:
+    total_os: int = 0
+    os_finalizadas: int = 0
+    os_valorizadas: int = 0
+    os_sem_valorizacao: int = 0
+    custo_total: float = 0.0
+    custo_medio: float = 0.0
+    veiculos: int = 0
+    motoristas: int = 0
+    tempo_medio_dias: int = 0
+
+
+def _nunique(values: np.ndarray) -> int:
+    return int(pd.unique(values).size)
+
+
+def _finalizadas(df: pd.DataFrame) -> np.ndarray:
+    """Máscara de OS finalizadas (datahorafim preenchida e status FINALIZADA)."""
+    if "Situação da OS" in df.columns:
+        # A classificação já resolve a regra: finalizada <=> uma das situações finalizadas
+        return df["Situação da OS"].isin(SITUACOES_FINALIZADAS).to_numpy()
+    status = df["status"].fillna("").astype(str).str.strip().str.upper()
+    return (df["datahorafim"].notna() & (status == "FINALIZADA")).to_numpy()
+
+
+def calcular_kpis(df: pd.DataFrame) -> KPIs:
+    """Calcula todos os indicadores dos cards para o DataFrame (já filtrado)."""
+    if df.empty:
+        return KPIs()
+
+    numeroos = df["numeroos"].to_numpy()
+    valor = df["valortotal"].to_numpy(dtype=float) if "valortotal" in df.columns else np.zeros(len(df))
+    valorizado = valor > 0
+    custo_total = float(np.nansum(valor))
+    custo_medio = float(valor[valorizado].mean()) if valorizado.any() else 0.0
+
+    inicio = df["datahorainicio"].to_numpy(dtype="datetime64[ns]")
+    fim = df["datahorafim"].to_numpy(dtype="datetime64[ns]")
+    com_datas = ~np.isnat(inicio) & ~np.isnat(fim)
+    if com_datas.any():
+        dias = (fim[com_datas] - inicio[com_datas]) / np.timedelta64(1, "D")
+        tempo_medio_dias = int(dias.mean())
+    else:
+        tempo_medio_dias = 0
+
+    return KPIs(
+        total_os=_nunique(numeroos),
+        os_finalizadas=_nunique(numeroos[_finalizadas(df)]),
+        os_valorizadas=_nunique(numeroos[valorizado]),
+        os_sem_valorizacao=_nunique(numeroos[valor == 0]),
+        custo_total=custo_total,
+        custo_medio=custo_medio,
+        veiculos=int(df["placaequipamento"].nunique()),
+        motoristas=int(df["motoristaresponsavel"].nunique()),
+        tempo_medio_dias=tempo_medio_dias,
+    )
@@ -0,0 +1,111 @@
+"""
+Serviço de atualização único por processo, independente das sessões do Streamlit.
+- Dono do agendamento: uma thread que executa a atualização a cada intervalo.
+- No máximo uma atualização em andamento (agendada, manual ou disparada em segundo plano).
+- Expõe estado, log e horário da próxima execução (atributos) para qualquer página.
+"""
+import threading
+import time
+from typing import Any, Callable, Optional
+
+LogCallback = Callable[[str], Any]
+
+
+class RefreshService:
+    """Agendador de atualizações compartilhado por todas as sessões."""
+
+    def __init__(self, refresh: Callable[[LogCallback], bool], interval_seconds: Callable[[], float]):
+        self._refresh = refresh
+        self._interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        # Protege start/stop: duas sessões não podem iniciar dois laços ao mesmo tempo
+        self._agendador = threading.Lock()
+        self._disparo_inicial = threading.Lock()
+        self._disparou = False
+        self.next_run: Optional[float] = None
+        self.last_run: Optional[str] = None
+        self.last_success: Optional[bool] = None
+        self.log = "Aguardando início do agendador."
+
+    @property
+    def running(self) -> bool:
+        """Agendador ativo (thread viva e sem pedido de parada)."""
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    @property
+    def refreshing(self) -> bool:
+        """Há uma atualização em andamento."""
+        return self._lock.locked()
+
+    def run(self, log_callback: Optional[LogCallback] = None,
+            refresh: Optional[Callable[[LogCallback], bool]] = None) -> Optional[bool]:
+        """
+        Executa uma atualização na thread chamadora (por padrão a atualização completa).
+        Retorna None sem executar nada se outra atualização já estiver em andamento.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            def _log(message):
+                self.log = message
+                if log_callback is not None:
+                    log_callback(message)
+
+            try:
+                success = bool((refresh or self._refresh)(_log))
+            except Exception as e:
+                _log(f"Erro na atualização: {e}")
+                success = False
+            self.last_success = success
+            if success:
+                self.last_run = time.strftime('%d/%m/%Y %H:%M:%S')
+            return success
+        finally:
+            self._lock.release()
+
+    def trigger(self) -> bool:
+        """Dispara uma atualização em segundo plano. Retorna False se já houver uma em andamento."""
+        if self.refreshing:
+            return False
+        threading.Thread(target=self.run, daemon=True, name="refresh-once").start()
+        return True
+
+    def trigger_once(self) -> bool:
+        """
+        Dispara uma atualização em segundo plano só na primeira chamada do processo
+        (ex.: partida a frio pelo snapshot). Falhas não geram novas tentativas a cada rerun.
+        """
+        with self._disparo_inicial:
+            if self._disparou:
+                return False
+            self._disparou = True
+        return self.trigger()
+
+    def start(self):
+        """Inicia o agendador (sem efeito se já estiver ativo)."""
+        with self._agendador:
+            if self.running:
+                return
+            stop = threading.Event()
+            self._stop = stop
+            self._thread = threading.Thread(target=self._loop, args=(stop,), daemon=True, name="refresh-service")
+            self._thread.start()
+
+    def stop(self):
+        """Para o agendador; uma atualização em andamento termina normalmente."""
+        with self._agendador:
+            if self._stop is not None:
+                self._stop.set()
+            self.next_run = None
+
+    def _loop(self, stop: threading.Event):
+        while not stop.is_set():
+            self.next_run = None
+            self.run()
+            if stop.is_set():
+                break
+            self.next_run = time.time() + self._interval_seconds()
+            stop.wait(max(1.0, self.next_run - time.time()))
+        self.next_run = None
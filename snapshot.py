@@ -0,0 +1,71 @@
+"""
+Snapshot em disco (Arrow IPC / Feather v2) do conjunto de dados processado do dashboard.
+- Gravado após cada atualização bem-sucedida: DataFrame de OS e DataFrame de detalhes.
+- Gravação atômica: os arquivos vão para um diretório novo e o ponteiro CURRENT é trocado com os.replace.
+- Leitura direta do Arrow IPC (sem parse), para o dashboard abrir logo após um restart, antes da primeira atualização.
+- Só diretórios com o nome de snapshot (prefixo snapshot-) são removidos na limpeza: o diretório pode ser compartilhado.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow.feather as feather
+
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR", ".snapshot")
+CURRENT_FILE = "CURRENT"
+TAG_PREFIX = "snapshot-"
+# snapshot-<AAAAMMDDhhmmss>-<versão>-<8 hex>; o formato sem prefixo é o das versões anteriores
+_TAG_RE = re.compile(r"^(snapshot-)?\d{14}-.+-[0-9a-f]{8}$")
+
+
+def salvar_snapshot(df_os: pd.DataFrame, df_detalhes: pd.DataFrame, version: Any,
+                    diretorio: str = SNAPSHOT_DIR) -> str:
+    """Grava o snapshot e o torna o atual. Retorna a etiqueta de versão gravada."""
+    tag = f"{TAG_PREFIX}{time.strftime('%Y%m%d%H%M%S')}-{version}-{uuid.uuid4().hex[:8]}"
+    destino = os.path.join(diretorio, tag)
+    os.makedirs(destino, exist_ok=True)
+    feather.write_feather(df_os.reset_index(drop=True), os.path.join(destino, "os.arrow"))
+    feather.write_feather(df_detalhes.reset_index(drop=True), os.path.join(destino, "detalhes.arrow"))
+
+    meta = {"tag": tag, "version": str(version), "criado_em": time.strftime('%d/%m/%Y %H:%M:%S')}
+    tmp = os.path.join(diretorio, f"{CURRENT_FILE}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(diretorio, CURRENT_FILE))
+
+    # Remove snapshots antigos: só diretórios com nome de snapshot que contenham os arquivos do snapshot
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        if (nome != tag and _TAG_RE.match(nome) and os.path.isdir(caminho)
+                and os.path.isfile(os.path.join(caminho, "os.arrow"))):
+            shutil.rmtree(caminho, ignore_errors=True)
+    return tag
+
+
+def snapshot_atual(diretorio: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """Metadados do snapshot atual (tag, version, criado_em) lidos do ponteiro CURRENT, ou None se não houver."""
+    try:
+        with open(os.path.join(diretorio, CURRENT_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) and "tag" in meta else None
+
+
+def carregar_snapshot(diretorio: str = SNAPSHOT_DIR) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]]:
+    """Lê o snapshot atual. Retorna (df_os, df_detalhes, meta) ou None se não houver."""
+    try:
+        meta = snapshot_atual(diretorio)
+        if meta is None:
+            return None
+        origem = os.path.join(diretorio, meta["tag"])
+        df_os = feather.read_table(os.path.join(origem, "os.arrow")).to_pandas()
+        df_detalhes = feather.read_table(os.path.join(origem, "detalhes.arrow")).to_pandas()
+    except (OSError, ValueError, KeyError):
+        return None
+    return df_os, df_detalhes, meta
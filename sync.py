@@ -0,0 +1,214 @@
+"""
+Sincronização incremental (high-watermark) do endpoint last-update.
+- Guarda o maior `lastupdate` visto e pede apenas o que mudou desde então (menos uma margem de segurança).
+- Mescla o delta (DataFrame do histórico) no conjunto existente por `numeroos`.
+- Planeja quais OS precisam ter os detalhes buscados novamente (novas, alteradas ou não finalizadas).
+- Mantém o índice das OS em andamento a partir do delta, sem percorrer o histórico completo.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Data usada quando ainda não há nenhum dado carregado (carga completa)
+FULL_SYNC_START = "2020-01-01"
+DEFAULT_OVERLAP_DAYS = 1
+
+
+# Fuso no fim de um texto de data/hora (Z, ±hh:mm ou ±hhmm), logo após o horário
+_FUSO_RE = r"(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)\s*(?:Z|[+-]\d{2}:?\d{2})$"
+_FUSO_RE_COMPILADO = re.compile(_FUSO_RE)
+
+
+def _datas_sem_fuso(valores) -> pd.Series:
+    """
+    Converte para datas sem fuso (datetime64[ns]), aceitando valores com e sem fuso misturados;
+    inválidos viram NaT. Como em database._para_datetime, o fuso é descartado e o horário local
+    é mantido (é assim que o lastupdate fica gravado no banco).
+    """
+    serie = pd.Series(valores)
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        return serie.dt.tz_localize(None).astype("datetime64[ns]")
+    if pd.api.types.is_datetime64_dtype(serie.dtype):
+        return serie.astype("datetime64[ns]")
+    if pd.api.types.infer_dtype(serie, skipna=True) in ("string", "empty"):
+        # Só textos (caso comum): o fuso é removido de forma vetorizada
+        serie = serie.astype("str").str.strip().str.replace(_FUSO_RE, r"\1", regex=True)
+    else:
+        # Mistura de textos e datas (ex.: datetimes vindos do banco): datas com tzinfo perdem o tzinfo
+        serie = serie.astype(object).map(
+            lambda v: _FUSO_RE_COMPILADO.sub(r"\1", v.strip()) if isinstance(v, str)
+            else v.replace(tzinfo=None) if isinstance(v, datetime) and v.tzinfo is not None
+            else v
+        )
+    datas = pd.to_datetime(serie, errors="coerce", format="mixed", utc=True)
+    return datas.dt.tz_convert(None).astype("datetime64[ns]")
+
+
+def compute_watermark(df: Optional[pd.DataFrame]) -> Optional[pd.Timestamp]:
+    """Retorna o maior `lastupdate` do histórico (ou None se nenhum for válido)."""
+    if df is None or df.empty or "lastupdate" not in df.columns:
+        return None
+    watermark = _datas_sem_fuso(df["lastupdate"]).max()
+    return None if pd.isna(watermark) else watermark
+
+
+def since_date(watermark: Optional[pd.Timestamp], overlap_days: int = DEFAULT_OVERLAP_DAYS) -> str:
+    """Data (YYYY-MM-DD) a enviar ao endpoint last-update, já descontada a margem de segurança."""
+    if watermark is None:
+        return FULL_SYNC_START
+    since = (watermark - timedelta(days=overlap_days)).strftime("%Y-%m-%d")
+    return max(since, FULL_SYNC_START)
+
+
+def _lastupdates(df: pd.DataFrame) -> List[Any]:
+    """Valores de `lastupdate` como objetos Python (None quando ausente), comparáveis entre versões."""
+    if "lastupdate" not in df.columns:
+        return [None] * len(df)
+    coluna = df["lastupdate"].astype(object)
+    return coluna.where(coluna.notna(), None).tolist()
+
+
+def merge_by_numeroos(existing: Optional[pd.DataFrame],
+                      delta: pd.DataFrame) -> Tuple[pd.DataFrame, List[int]]:
+    """
+    Mescla o delta no histórico existente (o delta prevalece; OS atualizadas vão para o fim).
+    Retorna (histórico mesclado, numeroos novos ou com `lastupdate` alterado).
+    """
+    if delta.empty or "numeroos" not in delta.columns:
+        # Nada mudou desde a marca d'água: o histórico continua o mesmo
+        return (existing if existing is not None else delta), []
+    delta = delta.drop_duplicates("numeroos", keep="last")
+    if existing is None or existing.empty:
+        return delta.reset_index(drop=True), delta["numeroos"].tolist()
+
+    anteriores = dict(zip(existing["numeroos"].tolist(), _lastupdates(existing)))
+    changed = [
+        numeroos for numeroos, lastupdate in zip(delta["numeroos"].tolist(), _lastupdates(delta))
+        if numeroos not in anteriores or anteriores[numeroos] != lastupdate
+    ]
+    mantidos = existing[~existing["numeroos"].isin(delta["numeroos"])]
+    return pd.concat([mantidos, delta], ignore_index=True), changed
+
+
+# Colunas do índice de OS em andamento (as usadas pela página OS em Andamento)
+ANDAMENTO_COLUMNS = [
+    "numeroos", "datahoraos", "datahorainicio", "datahorafim",
+    "placaequipamento", "marcaequipamento", "titulomanutencao", "tipomanutencao", "status",
+    "motoristaresponsavel", "mecanicoresponsavel", "descricaoos",
+]
+
+
+def em_andamento(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """OS em andamento (datahorainicio preenchida e datahorafim vazia), só com as ANDAMENTO_COLUMNS."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=ANDAMENTO_COLUMNS)
+    mask = df["datahorainicio"].notna() & df["datahorafim"].isna()
+    return df.loc[mask, [c for c in ANDAMENTO_COLUMNS if c in df.columns]].reset_index(drop=True)
+
+
+def atualizar_andamento(andamento: Optional[pd.DataFrame], delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica o delta do last-update ao índice de OS em andamento: as OS do delta saem do índice
+    e voltam só se ainda estiverem em andamento (as demais continuam como estavam).
+    """
+    if delta.empty or "numeroos" not in delta.columns:
+        return andamento if andamento is not None else em_andamento(None)
+    delta = delta.drop_duplicates("numeroos", keep="last")
+    novas = em_andamento(delta)
+    if andamento is None or andamento.empty:
+        return novas
+    mantidas = andamento[~andamento["numeroos"].isin(delta["numeroos"])]
+    if novas.empty:
+        return mantidas.reset_index(drop=True)
+    return pd.concat([mantidas, novas], ignore_index=True)
+
+
+def lastupdate_por_os(df: pd.DataFrame) -> Dict[Any, Any]:
+    """Mapa numeroos -> lastupdate do histórico."""
+    return dict(zip(df["numeroos"].tolist(), _lastupdates(df)))
+
+
+@dataclass
+class PlanoDetalhes:
+    """OS cujos detalhes serão consultados e relatório do planejamento (chamadas evitadas)."""
+    numeros: List[Any] = field(default_factory=list)
+    total: int = 0
+    novas: int = 0
+    alteradas: int = 0
+    abertas: int = 0
+    ignoradas: int = 0
+
+    def resumo(self) -> str:
+        return (f"{self.total} OS: {len(self.numeros)} a consultar ({self.novas} novas, {self.alteradas} alteradas, "
+                f"{self.abertas} não finalizadas); {self.ignoradas} finalizadas sem alteração ignoradas")
+
+
+def _finalizadas(df: pd.DataFrame) -> np.ndarray:
+    """Mesmo critério de database.os_atende_criterios: status FINALIZADA com início e fim preenchidos."""
+    status = df["status"].fillna("").astype(str).str.strip().str.upper() if "status" in df.columns \
+        else pd.Series("", index=df.index)
+    inicio = df["datahorainicio"].notna() if "datahorainicio" in df.columns else False
+    fim = df["datahorafim"].notna() if "datahorafim" in df.columns else False
+    return ((status == "FINALIZADA") & inicio & fim).to_numpy()
+
+
+def planejar_detalhes(df: pd.DataFrame, sincronizados: Dict[Any, Any],
+                      refetch_abertas: bool = True) -> PlanoDetalhes:
+    """
+    Decide de quais OS buscar os detalhes:
+    OS nunca detalhadas, cujo `lastupdate` mudou desde a última busca ou (com `refetch_abertas`) ainda não finalizadas.
+    `sincronizados` mapeia numeroos -> lastupdate vigente quando os detalhes foram obtidos
+    (em memória ou gravados no banco); os valores são comparados como datas.
+    """
+    if df is None or df.empty:
+        return PlanoDetalhes()
+    numeros = df["numeroos"].to_numpy()
+    lastupdate = _datas_sem_fuso(df["lastupdate"]).to_numpy() \
+        if "lastupdate" in df.columns else np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    conhecidos = pd.Series(sincronizados, dtype=object)
+    nova = ~pd.Index(numeros).isin(conhecidos.index)
+    anterior = _datas_sem_fuso(conhecidos.reindex(numeros).to_numpy()).to_numpy()
+    mesma = (anterior == lastupdate) | (np.isnat(anterior) & np.isnat(lastupdate))
+    alterada = ~nova & ~mesma
+    aberta = ~_finalizadas(df) & ~nova & ~alterada
+    buscar = nova | alterada | (aberta if refetch_abertas else False)
+    return PlanoDetalhes(
+        numeros=numeros[buscar].tolist(),
+        total=len(df),
+        novas=int(nova.sum()),
+        alteradas=int(alterada.sum()),
+        abertas=int(aberta.sum()) if refetch_abertas else 0,
+        ignoradas=int((~buscar).sum()),
+    )
+
+
+def registros_os(df: pd.DataFrame, numeros: List[Any]) -> List[Dict[str, Any]]:
+    """Linhas do histórico das OS informadas como dicts (valores ausentes como None), para gravação no banco."""
+    linhas = df[df["numeroos"].isin(numeros)].astype(object)
+    return linhas.where(linhas.notna(), None).to_dict("records")
+
+
+def _details_numeroos(entry: Dict[str, Any]) -> Optional[Any]:
+    """Extrai o numeroos de uma resposta os-details (None se não houver itens)."""
+    data = entry.get("data") or []
+    if data and data[0] is not None:
+        return data[0].get("numeroos")
+    return None
+
+
+def merge_details(existing: List[Dict[str, Any]],
+                  novos: Dict[Any, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Substitui as respostas os-details das OS consultadas agora (`novos`, {numeroos: resposta}).
+    OS que falharam na consulta mantêm os detalhes anteriores.
+    """
+    consultadas = {str(n) for n in novos}
+    mantidos = [
+        entry for entry in existing
+        if _details_numeroos(entry) is not None and str(_details_numeroos(entry)) not in consultadas
+    ]
+    return mantidos + [payload for payload in novos.values() if payload.get("status")]
@@ -0,0 +1,124 @@
+"""
+Equivalência da classificação vetorizada da situação da OS com a versão linha a linha
+(df.apply(classify_os_status, axis=1)) que o dashboard usava antes, e paginação ordenada no servidor.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processing import SITUACOES_OS, classify_os_status, posicoes_pagina  # noqa: E402
+
+
+def classify_os_status_linha(row):
+    """Versão original, aplicada linha a linha: referência da equivalência."""
+    is_valorizado = row.get('valortotal', 0) > 0
+    status_str = str(row.get('status', '')).strip().upper()
+    is_finalizada = pd.notna(row['datahorafim']) and status_str == 'FINALIZADA'
+    if is_valorizado and is_finalizada: return "VALORIZADO E FINALIZADO"
+    if pd.notna(row['datahorainicio']) and pd.isna(row['datahorafim']): return "ANDAMENTO"
+    if is_valorizado and pd.isna(row['datahorafim']): return "EXECUTADO"
+    if is_finalizada: return "FINALIZADA"
+    if pd.isna(row['datahorainicio']) and pd.isna(row['datahorafim']): return "EM BRANCO"
+    return "OUTRO"
+
+
+def _referencia(df):
+    return df.apply(classify_os_status_linha, axis=1).astype(str).tolist()
+
+
+INICIO = pd.Timestamp("2024-03-01 08:00")
+FIM = pd.Timestamp("2024-03-02 17:00")
+
+
+def _casos_borda():
+    """Combinações de início/fim (NaT), status (vazio, caixa, espaços, nulo) e valortotal (0, >0, NaN)."""
+    linhas = []
+    for inicio in (INICIO, pd.NaT):
+        for fim in (FIM, pd.NaT):
+            for status in ("FINALIZADA", "finalizada", "  Finalizada ", "", "   ", "ABERTA", None, np.nan):
+                for valor in (0.0, 150.5, np.nan, -10.0):
+                    linhas.append({
+                        "datahorainicio": inicio,
+                        "datahorafim": fim,
+                        "status": status,
+                        "valortotal": valor,
+                    })
+    df = pd.DataFrame(linhas)
+    df["datahorainicio"] = pd.to_datetime(df["datahorainicio"])
+    df["datahorafim"] = pd.to_datetime(df["datahorafim"])
+    return df
+
+
+def test_equivalente_nos_casos_de_borda():
+    df = _casos_borda()
+    assert classify_os_status(df).astype(str).tolist() == _referencia(df)
+
+
+def test_equivalente_sem_coluna_valortotal():
+    df = _casos_borda().drop(columns=["valortotal"])
+    assert classify_os_status(df).astype(str).tolist() == _referencia(df)
+
+
+def test_todas_as_situacoes_aparecem_nos_casos_de_borda():
+    assert set(classify_os_status(_casos_borda()).astype(str)) == set(SITUACOES_OS)
+
+
+def test_equivalente_em_amostra_aleatoria():
+    rng = np.random.default_rng(42)
+    n = 5_000
+    datas = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+    df = pd.DataFrame({
+        "datahorainicio": pd.Series(datas).where(rng.random(n) > 0.2),
+        "datahorafim": pd.Series(datas + pd.Timedelta(days=1)).where(rng.random(n) > 0.4),
+        "status": rng.choice(["FINALIZADA", "finalizada ", "ABERTA", "", "CANCELADA"], n),
+        "valortotal": np.where(rng.random(n) > 0.5, rng.uniform(0, 5000, n), 0.0),
+    })
+    assert classify_os_status(df).astype(str).tolist() == _referencia(df)
+
+
+@pytest.mark.parametrize("status", ["FINALIZADA", "ABERTA"])
+def test_preserva_indice_e_categorias(status):
+    df = pd.DataFrame(
+        {"datahorainicio": [INICIO], "datahorafim": [FIM], "status": [status], "valortotal": [10.0]},
+        index=[73],
+    )
+    resultado = classify_os_status(df)
+    assert resultado.index.tolist() == [73]
+    assert list(resultado.cat.categories) == SITUACOES_OS
+
+
+def _colunas_com_empates(n=2_000):
+    rng = np.random.default_rng(7)
+    placas = rng.choice(["AAA0001", "BBB0002", "CCC0003", "DDD0004"], n).astype(object)
+    placas[rng.random(n) < 0.05] = None
+    valores = rng.choice([0.0, 10.0, 25.5], n)
+    valores[rng.random(n) < 0.05] = np.nan
+    datas = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 3, n), unit="D"))
+    return {
+        "categoria": pd.Series(pd.Categorical(placas)),
+        "texto": pd.Series(placas),
+        "numero": pd.Series(valores),
+        "data": datas.where(rng.random(n) > 0.05),
+    }
+
+
+@pytest.mark.parametrize("coluna", ["categoria", "texto", "numero", "data"])
+@pytest.mark.parametrize("crescente", [True, False])
+@pytest.mark.parametrize("tamanho_pagina", [7, 50, 333])
+def test_paginas_com_empates_cobrem_todas_as_linhas(coluna, crescente, tamanho_pagina):
+    serie = _colunas_com_empates()[coluna]
+    paginas = [
+        posicoes_pagina(serie, inicio, inicio + tamanho_pagina, crescente=crescente)
+        for inicio in range(0, len(serie), tamanho_pagina)
+    ]
+    todas = np.concatenate(paginas)
+    assert sorted(todas.tolist()) == list(range(len(serie)))
+
+    # Mesma ordem de sort_values estável (empates na ordem das linhas, vazios por último)
+    esperado = serie.sort_values(ascending=crescente, kind="stable", na_position="last").index
+    assert todas.tolist() == esperado.tolist()
@@ -0,0 +1,87 @@
+"""Leitor JSON incremental do last-update (ingest.iter_registros) comparado com json.loads."""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+
+REGISTROS = [
+    {"numeroos": 1, "descricaoos": 'Troca de "filtro" e óleo', "fornecedor": "C:\\oficina\\nova"},
+    {"numeroos": "2", "descricaoos": "linha 1\nlinha 2\ttab \\\"aspas\\\"", "status": "FINALIZADA"},
+    {"numeroos": 3, "descricaoos": "\u00e7\u00e3o \u20ac \U0001F69A", "lastupdate": None},
+    {"numeroos": 4, "pecas": [{"material": "PNEU", "quantidade": 2.5e0}, [1, [2, [3]]], {}], "extra": {"a": {"b": []}}},
+    {"numeroos": 5, "hodometro": -123456789012345678901234567890, "valor": 0.1, "ok": True, "vazio": ""},
+]
+
+
+def _blocos(texto, tamanho, como_bytes=True):
+    dados = texto.encode("utf-8") if como_bytes else texto
+    return [dados[i:i + tamanho] for i in range(0, len(dados), tamanho)]
+
+
+def _payload(registros, **kwargs):
+    return json.dumps({"status": True, "data": registros, "total": len(registros)}, **kwargs)
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 7, 64, 10 ** 6])
+@pytest.mark.parametrize("como_bytes", [True, False])
+@pytest.mark.parametrize("formato", [{}, {"ensure_ascii": False}, {"indent": 2}, {"separators": (",", ":")}])
+def test_igual_a_json_loads(tamanho, como_bytes, formato):
+    texto = _payload(REGISTROS, **formato)
+    registros = list(ingest.iter_registros(_blocos(texto, tamanho, como_bytes)))
+    assert registros == json.loads(texto)["data"]
+
+
+def test_escapes_manuais():
+    # Aspas e barras escapadas e \u escritos à mão (inclusive par substituto)
+    texto = r'{"data": [{"s": "a\"b\\", "t": "\\\"", "u": "\u00e9\ud83d\ude9a\u0041"}, "x\\\\y"]}'
+    for tamanho in (1, 5, len(texto)):
+        assert list(ingest.iter_registros(_blocos(texto, tamanho))) == json.loads(texto)["data"]
+
+
+@pytest.mark.parametrize("texto", ['{"data": []}', '{"data": [ ]}', '{"status": true, "data": []}', "{}", '{"status": false}'])
+def test_lista_vazia_ou_ausente(texto):
+    assert list(ingest.iter_registros(_blocos(texto, 3))) == []
+    assert ingest.ler_historico(_blocos(texto, 3)).empty
+
+
+def test_campos_antes_e_depois_de_data_sao_ignorados():
+    texto = json.dumps({"meta": {"data": [9]}, "data": [{"numeroos": 1}], "fim": [1, 2]})
+    assert list(ingest.iter_registros(_blocos(texto, 4))) == [{"numeroos": 1}]
+
+
+def test_registros_cortados_entre_blocos_viram_dataframe():
+    texto = _payload([{"numeroos": i, "lastupdate": f"2024-01-{1 + i % 28:02d}T10:00:00"} for i in range(1, 501)])
+    df = ingest.ler_historico(_blocos(texto, 13), lote=64)
+    assert df["numeroos"].tolist() == list(range(1, 501))
+
+
+@pytest.mark.parametrize("corte", [1, 10, 25, -1, -2, -3])
+def test_entrada_truncada_levanta_erro(corte):
+    texto = _payload(REGISTROS)
+    truncado = texto[:corte]
+    with pytest.raises(ValueError):
+        list(ingest.iter_registros(_blocos(truncado, 7)))
+
+
+def test_truncada_em_qualquer_ponto_nunca_entrega_registro_parcial():
+    texto = json.dumps({"data": [{"numeroos": 12}, 345, "texto", {"numeroos": 678}]})
+    esperado = json.loads(texto)["data"]
+    for corte in range(len(texto)):
+        entregues = []
+        with pytest.raises(ValueError):
+            for registro in ingest.iter_registros(_blocos(texto[:corte], 5)):
+                entregues.append(registro)
+        # Só registros completos, na ordem, e nunca um número cortado (ex.: 34 no lugar de 345)
+        assert entregues == esperado[:len(entregues)]
+
+
+def test_utf8_cortado_no_fim_levanta_erro():
+    dados = _payload([{"s": "ção"}], ensure_ascii=False).encode("utf-8")
+    posicao = dados.index("ç".encode("utf-8")) + 1
+    with pytest.raises(ValueError):
+        list(ingest.iter_registros([dados[:posicao]]))
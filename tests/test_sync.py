@@ -0,0 +1,68 @@
+"""Planejamento da busca de detalhes (sync.planejar_detalhes) com lastupdate em formatos mistos."""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import sync  # noqa: E402
+
+
+def _historico(lastupdates):
+    n = len(lastupdates)
+    return pd.DataFrame({
+        "numeroos": list(range(1, n + 1)),
+        "status": ["FINALIZADA"] * n,
+        "datahorainicio": [pd.Timestamp("2024-03-01 08:00")] * n,
+        "datahorafim": [pd.Timestamp("2024-03-02 17:00")] * n,
+        "lastupdate": lastupdates,
+    })
+
+
+LASTUPDATES = [
+    "2024-03-02T17:05:00",
+    "2024-03-02T17:05:00-03:00",
+    "2024-03-02T17:05:00Z",
+    "2024-03-02 17:05:00.250+0000",
+    "2024-03-02",
+    None,
+]
+
+
+def test_lastupdate_com_e_sem_fuso_misturados():
+    df = _historico(LASTUPDATES)
+    # Sincronizados como o banco grava (database._para_datetime: fuso descartado, horário local mantido)
+    sincronizados = {n: database._para_datetime(v) for n, v in zip(df["numeroos"], LASTUPDATES)}
+    plano = sync.planejar_detalhes(df, sincronizados)
+    assert plano.numeros == []
+    assert plano.ignoradas == len(df)
+
+
+def test_sincronizados_em_texto_e_datas_com_fuso():
+    df = _historico(LASTUPDATES)
+    sincronizados = dict(zip(df["numeroos"], LASTUPDATES))
+    sincronizados[2] = datetime(2024, 3, 2, 17, 5, tzinfo=timezone(timedelta(hours=-3)))
+    sincronizados[3] = pd.Timestamp("2024-03-02 17:05", tz="UTC")
+    plano = sync.planejar_detalhes(df, sincronizados)
+    assert plano.numeros == []
+
+
+def test_lastupdate_alterado_com_fuso_e_detectado():
+    df = _historico(LASTUPDATES)
+    sincronizados = dict(zip(df["numeroos"], LASTUPDATES))
+    sincronizados[2] = "2024-03-01T09:00:00-03:00"
+    sincronizados[3] = datetime(2024, 3, 1, 9, 0)
+    del sincronizados[6]
+    plano = sync.planejar_detalhes(df, sincronizados)
+    assert plano.numeros == [2, 3, 6]
+    assert (plano.alteradas, plano.novas) == (2, 1)
+
+
+def test_lastupdate_ja_tipado_com_fuso():
+    lastupdate = pd.Series(pd.to_datetime(["2024-03-02 17:05", "2024-03-03 08:00"])).dt.tz_localize("America/Sao_Paulo")
+    df = _historico(lastupdate)
+    plano = sync.planejar_detalhes(df, {1: "2024-03-02T17:05:00-03:00", 2: datetime(2024, 3, 3, 8, 0)})
+    assert plano.numeros == []